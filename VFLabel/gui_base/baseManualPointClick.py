@@ -24,16 +24,7 @@ class BaseManualPointClick(baseWindow.BaseWindow):
     def init_window(self) -> None:
         layout = QVBoxLayout()
 
-        valid_extensions = (".mp4", ".avi")
-
-        # find video file
-        matching_files = [
-            os.path.join(self.project_path, f)
-            for f in os.listdir(self.project_path)
-            if f.endswith(valid_extensions)
-        ]
-
-        videodata = VFLabel.io.data.read_video(*matching_files)
+        videodata = VFLabel.io.data.read_project_video(self.project_path)
         path_grid_json = os.path.join(self.project_path, "progress_status.json")
 
         with open(path_grid_json, "r+") as f:
@@ -1,16 +1,25 @@
 import json
 import os
 import shutil
+import threading
+import traceback
 
 import cv2
-from PyQt5.QtCore import QRect, pyqtSignal
+from PyQt5.QtCore import QEventLoop, QRect, Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QFont, QPainter, QPixmap
-from PyQt5.QtWidgets import QFileDialog, QHBoxLayout, QPushButton
+from PyQt5.QtWidgets import (
+    QFileDialog,
+    QHBoxLayout,
+    QMessageBox,
+    QProgressDialog,
+    QPushButton,
+)
 
 import VFLabel.gui_base
 import VFLabel.gui_base.baseMainMenue
 import VFLabel.gui_base.baseWindow as baseWindow
 import VFLabel.gui_dialog.newProject
+import VFLabel.io
 
 
 def append_to_file(file_path, text_to_append):
@@ -37,6 +46,42 @@ def read_last_nonempty_line(file_path):
         print(f"An error occurred: {e}")
 
 
+class FrameExtractionThread(QThread):
+    signal_progress = pyqtSignal(int, int)
+    signal_failed = pyqtSignal(str)
+
+    def __init__(self, video_path: str, output_path: str, parent=None):
+        super().__init__(parent)
+        self.video_path = video_path
+        self.output_path = output_path
+        self.stop_event = threading.Event()
+        self.is_done = False
+
+    def run(self) -> None:
+        try:
+            VFLabel.io.extract_frames(
+                self.video_path,
+                self.output_path,
+                codec="raw",
+                progress_callback=self.signal_progress.emit,
+                stop_event=self.stop_event,
+            )
+        except InterruptedError:
+            return
+        except Exception as e:
+            # E.g. an unreadable video or a full disk.
+            # Exceptions would otherwise end the thread silently.
+            traceback.print_exc()
+            self.signal_failed.emit(f"{type(e).__name__}: {e}")
+            return
+
+        self.is_done = True
+
+    def cancel(self) -> None:
+        # Takes effect after the frame that is currently written.
+        self.stop_event.set()
+
+
 class BaseStartWindow(baseWindow.BaseWindow):
     signal_open_main_menu = pyqtSignal(str)
 
@@ -146,6 +191,10 @@ class BaseStartWindow(baseWindow.BaseWindow):
                 self.name_input, video_path=self.video_path
             )
 
+            # Frame extraction failed or got cancelled.
+            if project_path is None:
+                return
+
             append_to_file("assets/recent_projects", project_path)
             self.open_main_window(project_path)
 
@@ -219,19 +268,16 @@ class BaseStartWindow(baseWindow.BaseWindow):
         # TODO: Abfangen, wenn Ordner schon existiert
 
         # create subfolders
-        images_folder = "video"
-        os.makedirs(os.path.join(project_path, images_folder), exist_ok=True)
         os.makedirs(
             os.path.join(project_path, "laserpoint_segmentation"), exist_ok=True
         )
-        os.makedirs(os.path.join(project_path, "glottis_segmentation"), exist_ok=True)
-        os.makedirs(os.path.join(project_path, "vocalfold_segmentation"), exist_ok=True)
 
         # save video
         if not os.path.samefile(video_path, project_path):
             shutil.copy(video_path, project_path)
-        # divide video into frames and save frames
-        self.video_into_frames(video_path, project_path, images_folder)
+        # divide video into frames and save them into the frame store
+        if not self.video_into_frames(video_path, project_path):
+            return None
 
         # create empty json files
         json_path_label_cycles = os.path.join(project_path, "label_cycles.json")
@@ -274,31 +320,64 @@ class BaseStartWindow(baseWindow.BaseWindow):
             f.seek(0)
             json.dump(file, f, indent=4)
 
+        # index the json files in the project manifest
+        project = VFLabel.io.Project(project_path)
+        for json_path in [
+            json_path_label_cycles,
+            json_path_optimized_label_cycles,
+            json_path_clicked_laserpts,
+            json_path_computed_laserpts,
+            json_path_vf_points,
+            json_path_progress_status,
+        ]:
+            project.register_json(os.path.basename(json_path))
+
         return project_path
 
-    def video_into_frames(self, video_path, project_path, images_folder) -> None:
-        images_path = os.path.join(project_path, images_folder)
+    def video_into_frames(self, video_path, project_path) -> bool:
+        output_path = os.path.join(
+            project_path, VFLabel.io.frame_store.FRAME_STORE_FILENAME
+        )
 
         video = cv2.VideoCapture(video_path)
 
         if not video.isOpened():
-            print(f"Video couldn't be opened! Path might be wrong: {video_path}")
-            return
-
-        frame_count = 0
-
-        while True:
-            # read frame
-            ret, frame = video.read()
-
-            # stopping condition: no more frames
-            if not ret:
-                break
-
-            # save frame
-            frame_path = os.path.join(images_path, f"{frame_count:04d}.png")
-            cv2.imwrite(frame_path, frame)
-
-            frame_count += 1
+            self.show_error_dialog(
+                f"Video couldn't be opened! Path might be wrong: {video_path}"
+            )
+            return False
 
         video.release()
+
+        progress = QProgressDialog("Extracting frames", "Cancel", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.show()
+
+        def update_progress(num_written: int, num_frames: int) -> None:
+            progress.setMaximum(num_frames)
+            progress.setValue(num_written)
+
+        # decode frames into the frame store in a background thread to keep the UI responsive
+        extraction_thread = FrameExtractionThread(video_path, output_path, self)
+        extraction_thread.signal_progress.connect(update_progress)
+        extraction_thread.signal_failed.connect(self.show_error_dialog)
+        progress.canceled.connect(extraction_thread.cancel)
+
+        # wait for extraction_thread to finish
+        loop = QEventLoop()
+        extraction_thread.finished.connect(loop.quit)
+        extraction_thread.start()
+        loop.exec_()
+
+        progress.close()
+
+        return extraction_thread.is_done
+
+    def show_error_dialog(self, message: str) -> None:
+        dlg = QMessageBox(self)
+        dlg.setWindowTitle("Error")
+        dlg.setText("Frame extraction failed.")
+        dlg.setInformativeText(message)
+        dlg.setStandardButtons(QMessageBox.Ok)
+        dlg.setIcon(QMessageBox.Critical)
+        dlg.exec()
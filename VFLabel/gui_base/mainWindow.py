@@ -11,6 +11,7 @@ import VFLabel.gui_base
 import VFLabel.gui_base.baseMainMenue
 import VFLabel.gui_base.baseManualPointClick
 import VFLabel.gui_dialog.newProject
+import VFLabel.io
 
 
 class MainWindow(QMainWindow):
@@ -226,7 +227,8 @@ class MainWindow(QMainWindow):
         if video_path == "":
             return
 
-        video = VFLabel.io.data.read_video(video_path)
+        # Segmentations are only processed frame by frame, no need to keep them in memory.
+        video = VFLabel.io.LazyVideo(video_path)
         self.generate_glottis_data(video)
 
     def generate_glottis_data(self, segmentations) -> None:
@@ -239,9 +241,6 @@ class MainWindow(QMainWindow):
         self.open_main_menu(self.centralWidget().project_path)
 
     def save_segmentations_and_midlines(self, segmentations, midlines) -> None:
-        segmentation_path = os.path.join(
-            self.centralWidget().project_path, "glottis_segmentation"
-        )
         glottal_midlines_path = os.path.join(
             self.centralWidget().project_path, "glottal_midlines.json"
         )
@@ -259,9 +258,11 @@ class MainWindow(QMainWindow):
         with open(glottal_midlines_path, "w+") as outfile:
             json.dump(glottal_midline_dict, outfile)
 
-        for frame_index, seg in enumerate(segmentations):
-            image_save_path = os.path.join(segmentation_path, f"{frame_index:05d}.png")
-            cv2.imwrite(image_save_path, seg)
+        VFLabel.io.write_segmentation_masks(
+            VFLabel.io.Project(self.centralWidget().project_path),
+            "glottis",
+            segmentations,
+        )
 
     def update_glottis_progress(self):
         progress_state_path = os.path.join(
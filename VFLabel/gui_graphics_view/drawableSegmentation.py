@@ -12,6 +12,7 @@ import numpy as np
 
 
 import VFLabel.gui_graphics_view as ggw
+import VFLabel.io
 import VFLabel.utils.transforms as transforms
 import VFLabel.utils.enums as enums
 from VFLabel.gui_dialog.progress import ProgressDialog
@@ -224,13 +225,11 @@ class DrawableSegmentation(ggw.zoomableVideo.ZoomableVideo):
 
     def save_segmentation_mask(self):
         QApplication.processEvents()
-        save_folder = os.path.join(self.project_path, "glottis_segmentation")
-        os.makedirs(save_folder, exist_ok=True)
-
         images_list = self.qImage_list_2_black_white_np_list(self.images)
 
-        for frame_index, seg in enumerate(
-            ProgressDialog(images_list, "Saving Segmentations")
-        ):
-            image_save_path = os.path.join(save_folder, f"{frame_index:05d}.png")
-            cv2.imwrite(image_save_path, seg)
+        # All frames are stored as a single bit-packed volume in the project.
+        VFLabel.io.write_segmentation_masks(
+            VFLabel.io.Project(self.project_path),
+            "glottis",
+            ProgressDialog(images_list, "Saving Segmentations"),
+        )
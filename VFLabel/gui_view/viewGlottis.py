@@ -59,7 +59,6 @@ class GlottisSegmentationView(QWidget):
         horizontal_layout_bot = QHBoxLayout()
         bot_widget = QWidget()
         self.project_path = project_path
-        self.glottis_path = os.path.join(project_path, "glottis_segmentation")
 
         self.video = video
         qvideo = VFLabel.utils.transforms.vid_2_QImage(video)
@@ -70,8 +69,11 @@ class GlottisSegmentationView(QWidget):
         qvideo_segmentations = None
         segmentations_with_alpha = None
         glottal_midlines = None
-        if os.listdir(self.glottis_path):
-            self.segmentations = self.load_segmentations_from_folder(self.glottis_path)
+        glottis_segmentations = VFLabel.io.read_project_segmentations(
+            project_path, "glottis"
+        )
+        if len(glottis_segmentations):
+            self.segmentations = self.load_segmentations(glottis_segmentations)
             qvideo_segmentations = VFLabel.utils.transforms.vid_2_QImage(
                 self.segmentations
             )
@@ -238,11 +240,9 @@ class GlottisSegmentationView(QWidget):
         self.frame_label_middle.setText(f"Segmentation - Frame: {value}")
         self.frame_label_right.setText(f"Segmentation Overlay - Frame: {value}")
 
-    def load_segmentations_from_folder(self, path) -> List[np.array]:
+    def load_segmentations(self, masks: np.array) -> List[np.array]:
         segmentations = []
-        for file in sorted(os.listdir(path)):
-            file_path = os.path.join(path, file)
-            image = cv2.imread(file_path, 0) // 255
+        for image in masks // 255:
             colored = VFLabel.utils.utils.class_to_color_np(
                 image, [COLOR.BACKGROUND, COLOR.GLOTTIS]
             ).astype(np.uint8)
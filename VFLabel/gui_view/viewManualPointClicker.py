@@ -68,12 +68,7 @@ class ManualPointClickerView(QWidget):
             self.path_project, "final_optimized_laserpoints_labels.json"
         )
 
-        self.path_vf_segmentations: str = os.path.join(
-            self.path_project, "vocalfold_segmentation"
-        )
-        self.path_glottis_segmentations: str = os.path.join(
-            self.path_project, "glottis_segmentation"
-        )
+        self.project = io.Project(self.path_project)
 
         self.grid_width = grid_width
         self.grid_height = grid_height
@@ -244,7 +239,7 @@ class ManualPointClickerView(QWidget):
         # But if we generated points with cotracker before, load those.
 
         # Check if file is not empty
-        if not os.stat(load_from_path).st_size:
+        if not self.project.json_size(os.path.basename(load_from_path)):
             return
 
         # First load tracked or already repaired points.
@@ -281,8 +276,10 @@ class ManualPointClickerView(QWidget):
             with open(optimized_labels_path, "w") as f:
                 pass
 
-        file_filled = os.stat(optimized_points_path).st_size
-        file_labels_filled = os.stat(optimized_labels_path).st_size
+        file_filled = self.project.json_size(os.path.basename(optimized_points_path))
+        file_labels_filled = self.project.json_size(
+            os.path.basename(optimized_labels_path)
+        )
 
         if not file_filled or not file_labels_filled:
             return
@@ -421,17 +418,19 @@ class ManualPointClickerView(QWidget):
         # NEED TO TRANSFORM N x 3 OR WHATEVER TO NUM FRAMES x NUM POINTS x WHATEVER
         points_subpix = points_subpix.permute(1, 0, 2).numpy()
 
-        vocalfold_segmentations = np.array(
-            io.read_images_from_folder(self.path_vf_segmentations, is_gray=True)
-        )
-        glottis_segmentations = np.array(
-            io.read_images_from_folder(self.path_glottis_segmentations, is_gray=True)
+        # The masks stay packed and memory mapped, only the pixels under the points are read.
+        vocalfold_segmentations, vocalfold_width = io.read_project_packed_segmentations(
+            self.path_project, "vocalfold"
         )
-        filtered_points = pi.filter_points_not_on_vocalfold(
-            points_subpix, vocalfold_segmentations
+        glottis_segmentations, glottis_width = io.read_project_packed_segmentations(
+            self.path_project, "glottis"
         )
-        filtered_points = pi.filter_points_on_glottis(
-            filtered_points, glottis_segmentations
+        filtered_points = pi.filter_points_by_segmentations(
+            points_subpix,
+            vocalfold_segmentations,
+            glottis_segmentations,
+            vocalfold_width,
+            glottis_width,
         )
 
         self.optimized_points_widget.add_points_labels_and_ids(
@@ -1,17 +1,20 @@
 import json
 import os
-from typing import List
+import threading
+import traceback
+from typing import Any, Callable, List, Tuple
 
 import cv2
 import numpy as np
 import torch
 from PyQt5 import QtCore
-from PyQt5.QtCore import QPointF
+from PyQt5.QtCore import QPointF, Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QCursor, QIcon, QImage
 from PyQt5.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QMessageBox,
+    QProgressDialog,
     QPushButton,
     QVBoxLayout,
     QWidget,
@@ -33,6 +36,7 @@ import VFLabel.gui_widgets.videoPlayerBar
 import VFLabel.io as io
 import VFLabel.io.data
 import VFLabel.nn.point_tracking
+import VFLabel.nn.tracking_cache
 import VFLabel.utils.transforms
 import VFLabel.utils.utils
 
@@ -47,6 +51,39 @@ import VFLabel.utils.utils
 #  VWP    # SAVE    #
 
 
+class PointTrackingThread(QThread):
+    signal_progress = pyqtSignal(int, int)
+    signal_result = pyqtSignal(object)
+    signal_failed = pyqtSignal(str)
+
+    def __init__(
+        self,
+        function: Callable[[Callable[[int, int], None], threading.Event], Any],
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.function = function
+        self.stop_event = threading.Event()
+
+    def run(self) -> None:
+        try:
+            result = self.function(self.signal_progress.emit, self.stop_event)
+        except VFLabel.nn.point_tracking.TrackingCancelled:
+            return
+        except Exception as e:
+            # E.g. running out of GPU memory or a missing checkpoint.
+            # Exceptions would otherwise end the thread silently.
+            traceback.print_exc()
+            self.signal_failed.emit(f"{type(e).__name__}: {e}")
+            return
+
+        self.signal_result.emit(result)
+
+    def cancel(self) -> None:
+        # Takes effect after the window that is currently tracked.
+        self.stop_event.set()
+
+
 class PointClickerView(QWidget):
     def __init__(
         self,
@@ -81,12 +118,9 @@ class PointClickerView(QWidget):
             self.path_project, "optimized_laserpoints.json"
         )
 
-        self.path_vf_segmentations: str = os.path.join(
-            self.path_project, "vocalfold_segmentation"
-        )
-        self.path_glottis_segmentations: str = os.path.join(
-            self.path_project, "glottis_segmentation"
-        )
+        # Binary point tracks are stored in the project manifest,
+        # which is much faster to load than the JSON files.
+        self.project = VFLabel.io.Project(self.path_project)
 
         self.grid_width = grid_width
         self.grid_height = grid_height
@@ -287,7 +321,7 @@ class PointClickerView(QWidget):
         if not os.path.exists(clicked_points_path):
             return
 
-        file_filled = os.stat(clicked_points_path).st_size
+        file_filled = self.project.json_size("clicked_laserpoints.json")
 
         if not file_filled:
             return False
@@ -312,47 +346,57 @@ class PointClickerView(QWidget):
                         )
 
         # Tracked points window
-        predicted_points_path = os.path.join(
-            self.path_project, "predicted_laserpoints.json"
-        )
-        labels_path = os.path.join(self.path_project, "label_cycles.json")
+        if io.has_point_tracks(self.project, "predicted"):
+            self.load_point_tracks("predicted", self.cotracker_widget)
+            length = self.cotracker_widget.point_positions.shape[1]
+        else:
+            predicted_points_path = os.path.join(
+                self.path_project, "predicted_laserpoints.json"
+            )
+            labels_path = os.path.join(self.path_project, "label_cycles.json")
 
-        if not os.path.exists(clicked_points_path) or not os.path.exists(labels_path):
-            return
+            if not os.path.exists(clicked_points_path) or not os.path.exists(
+                labels_path
+            ):
+                return
 
-        file_filled = os.stat(predicted_points_path).st_size
-        file_labels_filled = os.stat(labels_path).st_size
+            file_filled = self.project.json_size("predicted_laserpoints.json")
+            file_labels_filled = self.project.json_size("label_cycles.json")
 
-        if not file_filled or not file_labels_filled:
-            return
-        else:
+            if not file_filled or not file_labels_filled:
+                return
+            else:
 
-            with open(labels_path, "r+") as f:
-                file = json.load(f)
-                length = len(file[f"Frame0"])
-                labels = np.zeros([len(self.video), length])
-                for i in range(len(self.video)):
-                    for k in range(len(file[f"Frame{i}"])):
-                        labels[i, k] = file[f"Frame{i}"][k]["label"]
+                with open(labels_path, "r+") as f:
+                    file = json.load(f)
+                    length = len(file[f"Frame0"])
+                    labels = np.zeros([len(self.video), length])
+                    for i in range(len(self.video)):
+                        for k in range(len(file[f"Frame{i}"])):
+                            labels[i, k] = file[f"Frame{i}"][k]["label"]
 
-            with open(predicted_points_path, "r+") as f:
-                file = json.load(f)
-                positions_np, ids_np = VFLabel.io.point_dict_to_cotracker(file)
+                with open(predicted_points_path, "r+") as f:
+                    file = json.load(f)
+                    positions_np, ids_np = VFLabel.io.point_dict_to_cotracker(file)
 
-                points_positions = np.zeros([*np.shape(labels), 2])
-                points_ids = np.zeros([*np.shape(labels), 2])
-                for i in range(len(self.video)):
-                    arg = np.argwhere(positions_np[:, 0] == i)
-                    points_positions[i] = positions_np[arg, 1:][:, 0, :]
+                    points_positions = np.zeros([*np.shape(labels), 2])
+                    points_ids = np.zeros([*np.shape(labels), 2])
+                    for i in range(len(self.video)):
+                        arg = np.argwhere(positions_np[:, 0] == i)
+                        points_positions[i] = positions_np[arg, 1:][:, 0, :]
 
-                    arg = np.argwhere(ids_np[:, 0] == i)
-                    points_ids[i] = ids_np[arg, 1:][:, 0, :]
+                        arg = np.argwhere(ids_np[:, 0] == i)
+                        points_ids[i] = ids_np[arg, 1:][:, 0, :]
 
-            self.cotracker_widget.add_points_labels_and_ids(
-                points_positions, labels, points_ids
-            )
+                self.cotracker_widget.add_points_labels_and_ids(
+                    points_positions, labels, points_ids
+                )
 
         # optimized points window
+        if io.has_point_tracks(self.project, "optimized"):
+            self.load_point_tracks("optimized", self.optimized_points_widget)
+            return
+
         optimized_points_path = os.path.join(
             self.path_project, "optimized_laserpoints.json"
         )
@@ -369,8 +413,8 @@ class PointClickerView(QWidget):
             with open(optimized_labels_path, "w") as f:
                 pass
 
-        file_filled = os.stat(optimized_points_path).st_size
-        file_labels_filled = os.stat(optimized_labels_path).st_size
+        file_filled = self.project.json_size("optimized_laserpoints.json")
+        file_labels_filled = self.project.json_size("optimized_label_cycles.json")
 
         if not file_filled or not file_labels_filled:
             return
@@ -405,6 +449,16 @@ class PointClickerView(QWidget):
                 points_positions, labels, points_ids
             )
 
+    def load_point_tracks(
+        self,
+        name: str,
+        widget: VFLabel.gui_graphics_view.labeledPoints.LabeledPoints,
+    ) -> None:
+        points, labels = io.read_point_tracks(self.project, name)
+        widget.add_points_labels_and_ids(
+            *io.point_tracks_to_point_lists(points, labels)
+        )
+
     def change_frame_label(self, value):
         if value < self.cycle_end:
             self.frame_label_left.setText(f"Click Points - Frame: {value}")
@@ -420,6 +474,15 @@ class PointClickerView(QWidget):
         dlg.setIcon(QMessageBox.Information)
         dlg.exec()
 
+    def show_error_dialog(self, title: str, message: str) -> None:
+        dlg = QMessageBox(self)
+        dlg.setWindowTitle("Error")
+        dlg.setText(f"{title} failed.")
+        dlg.setInformativeText(message)
+        dlg.setStandardButtons(QMessageBox.Ok)
+        dlg.setIcon(QMessageBox.Critical)
+        dlg.exec()
+
     def save_clicked_points(self, show_dialog: bool = True) -> None:
         self.disable_modes()
 
@@ -445,6 +508,17 @@ class PointClickerView(QWidget):
             self.cotracker_widget.point_labels,
             numpy_arr,
         )
+        VFLabel.io.write_point_tracks(
+            self.project,
+            "predicted",
+            numpy_arr,
+            io.labels_to_numpy_array(
+                np.asarray(self.cotracker_widget.point_labels),
+                ids,
+                self.grid_width,
+                self.grid_height,
+            ),
+        )
 
         if show_dialog:
             self.show_ok_dialog()
@@ -463,27 +537,137 @@ class PointClickerView(QWidget):
             self.optimized_points_widget.point_labels.numpy().tolist(),
             numpy_arr,
         )
+        VFLabel.io.write_point_tracks(
+            self.project,
+            "optimized",
+            numpy_arr,
+            io.labels_to_numpy_array(
+                self.optimized_points_widget.point_labels.numpy(),
+                ids,
+                self.grid_width,
+                self.grid_height,
+            ),
+        )
 
         if show_dialog:
             self.show_ok_dialog()
 
+    def run_in_background(
+        self,
+        function: Callable[[Callable[[int, int], None], threading.Event], Any],
+        title: str,
+        on_result: Callable[[Any], None],
+    ) -> None:
+        progress = QProgressDialog(title, "Cancel", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        progress.show()
+
+        def update_progress(num_done: int, num_total: int) -> None:
+            progress.setMaximum(num_total)
+            progress.setValue(num_done)
+
+        # Buttons that write to the project stay disabled until the thread finished,
+        # also after cancelling, such that the project is not modified concurrently.
+        buttons = [
+            self.button_track_points,
+            self.button_optimize_points,
+            self.button_finished_clicking,
+            self.button_save,
+        ]
+        for button in buttons:
+            button.setEnabled(False)
+
+        def finish() -> None:
+            progress.close()
+            for button in buttons:
+                button.setEnabled(True)
+
+        self.tracking_thread = PointTrackingThread(function, self)
+        self.tracking_thread.signal_progress.connect(update_progress)
+        self.tracking_thread.signal_result.connect(on_result)
+        self.tracking_thread.signal_failed.connect(
+            lambda message: self.show_error_dialog(title, message)
+        )
+        self.tracking_thread.finished.connect(finish)
+        progress.canceled.connect(self.tracking_thread.cancel)
+        self.tracking_thread.start()
+
     def track_points(self) -> None:
+        self.run_in_background(
+            self.compute_tracked_points, "Tracking points", self.set_tracked_points
+        )
+
+    def compute_tracked_points(
+        self,
+        progress_callback: Callable[[int, int], None],
+        stop_event: threading.Event,
+    ) -> Tuple[np.array, np.array, np.array, np.array, np.array, str]:
         dict = io.dict_from_json(
             os.path.join(self.path_project, "clicked_laserpoints.json")
         )
         points, ids = io.point_dict_to_cotracker(dict)
 
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        pred_points, pred_visibility = VFLabel.nn.point_tracking.track_points_windowed(
-            self.video, points, device=device
-        )
+        # Only track inside a region around the clicked points and the vocal folds.
+        # The region is fixed per project, such that moving a click keeps the cached tracks valid.
+        segmentations, segmentations_width = io.read_project_packed_segmentations(
+            self.path_project, "vocalfold"
+        )
+        roi = VFLabel.nn.tracking_cache.project_tracking_roi(
+            self.project,
+            points[:, 1:],
+            self.video.shape[1:3],
+            segmentations=segmentations,
+            segmentations_width=segmentations_width,
+        )
+
+        # Only laserpoints whose clicks changed since the last run are tracked again.
+        tracks, labels, key = VFLabel.nn.tracking_cache.track_points_cached(
+            self.project,
+            self.video,
+            points,
+            ids[:, 1:],
+            (self.grid_height, self.grid_width),
+            device="cuda" if torch.cuda.is_available() else "cpu",
+            roi=roi,
+            progress_callback=progress_callback,
+            stop_event=stop_event,
+        )
+        return (*io.point_tracks_to_point_lists(tracks, labels), points, ids, key)
+
+    def set_tracked_points(
+        self, result: Tuple[np.array, np.array, np.array, np.array, np.array, str]
+    ) -> None:
+        pred_points, pred_visibility, point_ids, points, ids, key = result
         self.cotracker_widget.add_points_labels_and_ids(
-            pred_points, pred_visibility, ids[:, 1:]
+            pred_points, pred_visibility, point_ids
         )
 
         self.save_tracked_points(show_dialog=False)
+        io.write_point_track_queries(
+            self.project, "predicted", points, ids[:, 1:], key=key
+        )
 
     def optimize_points(self) -> None:
+        self.run_in_background(
+            self.compute_optimized_points,
+            "Optimizing points",
+            self.set_optimized_points,
+        )
+
+    def compute_optimized_points(
+        self,
+        progress_callback: Callable[[int, int], None],
+        stop_event: threading.Event,
+    ) -> Tuple[np.array, np.array, np.array]:
+        num_steps = 4
+
+        def finish_step(num_done: int) -> None:
+            progress_callback(num_done, num_steps)
+            if stop_event.is_set():
+                raise VFLabel.nn.point_tracking.TrackingCancelled()
+
         dict = io.dict_from_json(
             os.path.join(self.path_project, "predicted_laserpoints.json")
         )
@@ -492,6 +676,7 @@ class PointClickerView(QWidget):
         video = self.video if self.video.shape[-1] == 1 else self.video[:, :, :, :1]
 
         classifications, crops = pi.classify_points(points, video)
+        finish_step(1)
 
         points_subpix, _ = pi.compute_subpixel_points(
             torch.from_numpy(points),
@@ -499,9 +684,11 @@ class PointClickerView(QWidget):
             torch.from_numpy(video),
             len(dict["Frame0"]),
         )
+        finish_step(2)
 
         points_subpix = pi.smooth_points(points_subpix)
         # points_subpix = pi.fill_nan_border_values(points_subpix)
+        finish_step(3)
 
         # NEED TO TRANSFORM N x 3 OR WHATEVER TO NUM FRAMES x NUM POINTS x WHATEVER
         points = points.reshape(self.video.shape[0], len(dict["Frame0"]), 3)[
@@ -512,22 +699,26 @@ class PointClickerView(QWidget):
             self.video.shape[0], len(dict["Frame0"])
         )
 
-        vocalfold_segmentations = np.array(
-            io.read_images_from_folder(self.path_vf_segmentations, is_gray=True)
+        # The masks stay packed and memory mapped, only the pixels under the points are read.
+        vocalfold_segmentations, vocalfold_width = io.read_project_packed_segmentations(
+            self.path_project, "vocalfold"
         )
-        glottis_segmentations = np.array(
-            io.read_images_from_folder(self.path_glottis_segmentations, is_gray=True)
+        glottis_segmentations, glottis_width = io.read_project_packed_segmentations(
+            self.path_project, "glottis"
         )
-        filtered_points = pi.filter_points_not_on_vocalfold(
-            points_subpix, vocalfold_segmentations
-        )
-        filtered_points = pi.filter_points_on_glottis(
-            filtered_points, glottis_segmentations
+        filtered_points = pi.filter_points_by_segmentations(
+            points_subpix,
+            vocalfold_segmentations,
+            glottis_segmentations,
+            vocalfold_width,
+            glottis_width,
         )
+        finish_step(4)
 
-        self.optimized_points_widget.add_points_labels_and_ids(
-            filtered_points, classifications, ids[:, 1:]
-        )
+        return filtered_points, classifications, ids[:, 1:]
+
+    def set_optimized_points(self, result: Tuple[np.array, np.array, np.array]) -> None:
+        self.optimized_points_widget.add_points_labels_and_ids(*result)
 
         self.save_optimized_points(show_dialog=False)
 
@@ -4,7 +4,7 @@ from typing import List
 
 import numpy as np
 from PyQt5 import QtCore
-from PyQt5.QtGui import QIcon, QPolygonF
+from PyQt5.QtGui import QIcon, QImage, QPolygonF
 from PyQt5.QtWidgets import (
     QApplication,
     QHBoxLayout,
@@ -21,6 +21,7 @@ import VFLabel.gui_dialog.progress
 import VFLabel.gui_graphics_view.transformableSegmentation
 import VFLabel.gui_widgets.videoPlayerBar
 import VFLabel.gui_widgets.vfSegmentationSlider
+import VFLabel.io
 import VFLabel.utils.transforms
 
 ############################### ^
@@ -46,6 +47,7 @@ class VocalfoldSegmentationView(QWidget):
     def __init__(self, project_path: str, video: np.array, parent=None):
         super(VocalfoldSegmentationView, self).__init__(parent)
         self.project_path = project_path
+        self.project = VFLabel.io.Project(self.project_path)
 
         # find data for this task if they already exist
         file_filled = self.load_data_from_project_folder()
@@ -234,8 +236,6 @@ class VocalfoldSegmentationView(QWidget):
     def save(self) -> None:
         self.setEnabled(False)
         QApplication.processEvents()
-        save_folder = os.path.join(self.project_path, "vocalfold_segmentation")
-        os.makedirs(save_folder, exist_ok=True)
         if (
             not self.draw_view.getPolygonPoints()
             or len(self.draw_view.getPolygonPoints()) < 3
@@ -244,6 +244,7 @@ class VocalfoldSegmentationView(QWidget):
             self.setEnabled(True)
             return
 
+        segmentations = []
         for i in VFLabel.gui_dialog.progress.ProgressDialog(
             range(self.video_player.get_video_length()), "Saving VF Segmentations"
         ):
@@ -254,8 +255,13 @@ class VocalfoldSegmentationView(QWidget):
                 self.setEnabled(True)
                 return
 
-            path = os.path.join(save_folder, f"{i:05d}.png")
-            pixmap.save(path)
+            image = pixmap.toImage().convertToFormat(QImage.Format_RGBA8888)
+            segmentations.append(VFLabel.utils.transforms.qImage_2_np(image)[:, :, 0])
+
+        # All frames are stored as a single bit-packed volume in the project.
+        VFLabel.io.write_segmentation_masks(
+            VFLabel.io.Project(self.project_path), "vocalfold", segmentations
+        )
 
         self.save_segmentation_polygons()
         self.interpolate_view.change_frame(self.video_player.slider.value())
@@ -424,7 +430,7 @@ class VocalfoldSegmentationView(QWidget):
     def load_data_from_project_folder(self):
         vf_path = os.path.join(self.project_path, "vocalfold_points.json")
 
-        file_filled = os.stat(vf_path).st_size
+        file_filled = self.project.json_size("vocalfold_points.json")
 
         if not file_filled:
             return False
@@ -1 +1,7 @@
 from .data import *
+from .frame_store import *
+from .lazy_video import *
+from .frame_extraction import *
+from .point_tracks import *
+from .project import *
+from .segmentation_masks import *
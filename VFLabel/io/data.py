@@ -1,7 +1,10 @@
 import json
+import operator
 import os
 import re
-from typing import List
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Tuple
 
 import cv2
 import numpy as np
@@ -9,17 +12,15 @@ import scipy
 from tqdm import tqdm
 
 import VFLabel.cv
+import VFLabel.io.frame_extraction as frame_extraction
+import VFLabel.io.frame_store as frame_store
+import VFLabel.io.lazy_video as lazy_video
+import VFLabel.io.project as project
 
 
 def create_image_data(image_dir, video_file):
-    try:
-        os.mkdir(image_dir)
-    except:
-        pass
-
-    os.system(
-        "ffmpeg -i {0} -start_number 0 {1}/%05d.png".format(video_file, image_dir)
-    )
+    # Decodes in-process and encodes the PNGs in parallel, named like ffmpeg's %05d.png output.
+    frame_extraction.extract_frames(video_file, image_dir, codec="png")
 
 
 def generate_laserpoint_images_from_mat(matfile, save_path, image_height, image_width):
@@ -98,28 +99,268 @@ def write_laserdot_mask(path, index, mask_image):
     cv2.imwrite("{}{:05d}.png".format(path, index), mask_image)
 
 
-def read_video(path):
+def _open_video(path: str, frame_range: Tuple[int, int] = None) -> cv2.VideoCapture:
     cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Video couldn't be opened! Path might be wrong: {path}")
+
+    if frame_range is not None and frame_range[0] > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_range[0])
 
-    frames = []
-    ret = True
-    while ret:
-        ret, img = (
-            cap.read()
-        )  # read one frame from the 'capture' object; img is (H, W, C)
-        if ret:
-            frames.append(img)
+    return cap
 
-    return np.array(frames)
 
+def _num_frames_in_range(frame_range: Tuple[int, int], start: int) -> int:
+    # Number of frames left to decode, None if decoding continues until the video ends.
+    if frame_range is None or frame_range[1] is None:
+        return None
+
+    return max(frame_range[1] - start, 0)
+
+
+def read_video(path: str, frame_range: Tuple[int, int] = None) -> np.array:
+    """
+    Decode a video, or a range of its frames, into a single array.
+
+    :param path: Path to the video file
+    :type path: str
+    :param frame_range: Optional [start, end) range of frames, end may be None to read until the end of the video
+    :type frame_range: Tuple[int, int]
+    :return: Video of shape FRAMES x HEIGHT x WIDTH x CHANNELS
+    :rtype: np.array
+    """
+    cap = cv2.VideoCapture(path)
+    num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    start = frame_range[0] if frame_range is not None else 0
+    remaining = _num_frames_in_range(frame_range, start)
+    num_frames = num_frames - start if remaining is None else min(num_frames, remaining)
+
+    # Decode into a single buffer sized by the frame count stored in the container.
+    # Only if the container underestimates it, further batches need to be appended.
+    batches = list(
+        iterate_video_batches(path, max(num_frames, 1), frame_range=frame_range)
+    )
+
+    if len(batches) == 0:
+        return np.array(batches)
+
+    return batches[0] if len(batches) == 1 else np.concatenate(batches)
+
+
+def iterate_video(path: str, frame_range: Tuple[int, int] = None) -> Iterator[np.array]:
+    """
+    Decode a video frame by frame without keeping previous frames in memory.
+
+    :param path: Path to the video file
+    :type path: str
+    :param frame_range: Optional [start, end) range of frames, end may be None to read until the end of the video
+    :type frame_range: Tuple[int, int]
+    :return: Generator yielding frames of shape HEIGHT x WIDTH x CHANNELS
+    :rtype: Iterator[np.array]
+    """
+    cap = _open_video(path, frame_range)
+    remaining = _num_frames_in_range(frame_range, frame_range[0] if frame_range else 0)
+
+    try:
+        while remaining is None or remaining > 0:
+            ret, img = cap.read()
+            if not ret:
+                break
+            yield img
+
+            if remaining is not None:
+                remaining -= 1
+    finally:
+        cap.release()
+
+
+def iterate_video_batches(
+    path: str,
+    batch_size: int = 64,
+    frame_range: Tuple[int, int] = None,
+    reuse_buffer: bool = False,
+) -> Iterator[np.array]:
+    """
+    Decode a video in batches of consecutive frames.
+
+    Frames are decoded directly into the batch array, without intermediate copies.
+
+    :param path: Path to the video file
+    :type path: str
+    :param batch_size: Number of frames per batch, the last batch may be smaller
+    :type batch_size: int
+    :param frame_range: Optional [start, end) range of frames, end may be None to read until the end of the video
+    :type frame_range: Tuple[int, int]
+    :param reuse_buffer: If set, every batch is decoded into the same array, i.e. a batch is only valid until the next one is requested
+    :type reuse_buffer: bool
+    :return: Generator yielding batches of shape BATCH x HEIGHT x WIDTH x CHANNELS
+    :rtype: Iterator[np.array]
+    """
+    cap = _open_video(path, frame_range)
+    remaining = _num_frames_in_range(frame_range, frame_range[0] if frame_range else 0)
+
+    try:
+        if remaining == 0:
+            return
+
+        ret, first_frame = cap.read()
+        if not ret:
+            return
+
+        batch = None
+        pending_frame = first_frame
+
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            if batch is None or not reuse_buffer or len(batch) != size:
+                batch = np.empty([size, *first_frame.shape], dtype=first_frame.dtype)
+
+            num_decoded = 0
+            if pending_frame is not None:
+                batch[0] = pending_frame
+                pending_frame = None
+                num_decoded = 1
+
+            while num_decoded < size:
+                frame = batch[num_decoded]
+                ret, decoded = cap.read(frame)
+                if not ret:
+                    break
+
+                # The decoder only writes in place, if the frame shape matches.
+                if decoded.ctypes.data != frame.ctypes.data:
+                    frame[...] = decoded
+
+                num_decoded += 1
+
+            if num_decoded > 0:
+                yield batch[:num_decoded]
+
+            if num_decoded < size:
+                return
+
+            if remaining is not None:
+                remaining -= num_decoded
+    finally:
+        cap.release()
+
+
+def find_project_video(project_path: str) -> str:
+    valid_extensions = (".mp4", ".avi")
+
+    matching_files = [
+        os.path.join(project_path, f)
+        for f in os.listdir(project_path)
+        if f.endswith(valid_extensions)
+    ]
+
+    return matching_files[0]
+
+
+def read_project_video(project_path: str) -> np.array:
+    """
+    Open the video of a project as a memory-mapped frame store.
+
+    The frame store is indexed as the "video" section of the project manifest.
+    Projects that were created before the frame store existed only contain the video file.
+    For these, the frame store is written once here, such that every later access is zero-copy.
+    If it can't be written, a :class:`LazyVideo` is returned, which decodes frames on demand.
+
+    :param project_path: Path to the project folder
+    :type project_path: str
+    :return: Video of shape FRAMES x HEIGHT x WIDTH x CHANNELS
+    :rtype: np.array
+    """
+    project_container = project.Project(project_path)
+    if "video" in project_container:
+        return project_container["video"]
+
+    frame_store_path = os.path.join(project_path, frame_store.FRAME_STORE_FILENAME)
+
+    try:
+        if not os.path.exists(frame_store_path):
+            frame_store.write_frame_store(
+                frame_store_path, iterate_video(find_project_video(project_path))
+            )
 
-def read_images_from_folder(path: str, is_gray: bool = False) -> List[np.array]:
+        project_container.register_file(
+            "video",
+            frame_store.FRAME_STORE_FILENAME,
+            frame_store.read_frame_store_header(frame_store_path),
+            "uint8",
+            frame_store.FRAME_STORE_HEADER_SIZE,
+            frame_store.read_frame_store_checksum(frame_store_path),
+        )
+    except OSError as e:
+        # E.g. read-only project folders. Decode on demand instead.
+        warnings.warn(f"Frame store couldn't be written: {e}")
+        if os.path.exists(frame_store_path):
+            return frame_store.open_frame_store(frame_store_path)
+        return lazy_video.LazyVideo(find_project_video(project_path))
+
+    return project_container["video"]
+
+
+def read_images_from_folder(
+    path: str,
+    is_gray: bool = False,
+    frame_range: Tuple[int, int] = None,
+    num_workers: int = None,
+) -> np.array:
+    """
+    Read all images of a folder in parallel into a single array.
+
+    The images are decoded by a thread pool, since cv2 releases the GIL while decoding,
+    and are written directly into one preallocated array.
+
+    :param path: Folder containing images of equal size, which are read in sorted order
+    :type path: str
+    :param is_gray: Read the images as single channel images
+    :type is_gray: bool
+    :param frame_range: Only read the images in [start, end)
+    :type frame_range: Tuple[int, int]
+    :param num_workers: Number of threads, defaults to the ThreadPoolExecutor default
+    :type num_workers: int
+    :raises ValueError: If an image can't be read or has a different size than the first one
+    :return: Array of shape N x HEIGHT x WIDTH (x CHANNELS)
+    :rtype: np.array
+    """
     files = sorted(os.listdir(path))
 
-    images = []
-    for file in files:
-        filepath = os.path.join(path, file)
-        images.append(cv2.imread(filepath, 0 if is_gray else 1))
+    if frame_range is not None:
+        files = files[frame_range[0] : frame_range[1]]
+
+    def read_image(file: str) -> np.array:
+        image = cv2.imread(os.path.join(path, file), 0 if is_gray else 1)
+
+        if image is None:
+            raise ValueError(f"Image {file} in {path} couldn't be read.")
+
+        return image
+
+    if len(files) == 0:
+        # cv2 reads images with 3 channels if they aren't read as gray.
+        return np.empty([0, 0, 0] if is_gray else [0, 0, 0, 3], dtype=np.uint8)
+
+    first_image = read_image(files[0])
+    images = np.empty([len(files), *first_image.shape], dtype=first_image.dtype)
+    images[0] = first_image
+
+    def read_into(index: int) -> None:
+        image = read_image(files[index])
+
+        if image.shape != first_image.shape:
+            raise ValueError(
+                f"Image {files[index]} has shape {image.shape}, expected {first_image.shape}."
+            )
+
+        images[index] = image
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        # Consume the results, such that exceptions of the workers are raised here.
+        list(executor.map(read_into, range(1, len(files))))
 
     return images
 
@@ -135,25 +376,33 @@ def dict_from_json(filepath: str) -> dict:
     return data
 
 
+def _flatten_point_dict(point_dict: dict) -> Tuple[np.array, np.array, np.array]:
+    # Flattens a point dict into arrays of frames, [x, y] positions and [x_id, y_id] ids,
+    # ordered by frame number. Every point is touched exactly once on the Python side.
+    get_values = operator.itemgetter("x_pos", "y_pos", "x_id", "y_id")
+    frame_numbers = {key: int(re.search(r"\d+", key).group()) for key in point_dict}
+    sorted_keys = sorted(point_dict.keys(), key=frame_numbers.get)
+
+    values = np.array(
+        [get_values(point) for key in sorted_keys for point in point_dict[key]],
+        dtype=float,
+    ).reshape(-1, 4)
+    frames = np.repeat(
+        np.array([frame_numbers[key] for key in sorted_keys], dtype=int),
+        [len(point_dict[key]) for key in sorted_keys],
+    )
+
+    return frames, values[:, :2], values[:, 2:].astype(int)
+
+
 def point_dict_to_numpy(
     point_dict: dict, grid_width: int, grid_height: int, video_length: int
 ) -> np.array:
     base = np.zeros([video_length, grid_height, grid_width, 2]) * np.nan
-    keys = point_dict.keys()
-    sorted_keys = sorted(keys, key=lambda x: int(re.search(r"\d+", x).group()))
-
-    for key in sorted_keys:
-        point_list = point_dict[key]
+    frames, positions, ids = _flatten_point_dict(point_dict)
 
-        for point in point_list:
-            x = point["x_pos"]
-            y = point["y_pos"]
-            x_id = point["x_id"]
-            y_id = point["y_id"]
-
-            frame = int(key.replace("Frame", ""))
-
-            base[frame, y_id, x_id] = np.array([x, y])
+    # A single scatter, later frames overwrite earlier entries just like sequential assignment.
+    base[frames, ids[:, 1], ids[:, 0]] = positions
 
     return base
 
@@ -161,40 +410,30 @@ def point_dict_to_numpy(
 # Returns two arrays that look like this:
 # [Frame, X, Y] and [Frame, x_id, y_id]
 def point_dict_to_cotracker(point_dict: dict) -> np.array:
-    positions = []
-    ids = []
-    keys = point_dict.keys()
-    sorted_keys = sorted(keys, key=lambda x: int(re.search(r"\d+", x).group()))
-
-    for key in sorted_keys:
-        point_list = point_dict[key]
+    frames, positions, ids = _flatten_point_dict(point_dict)
 
-        for point in point_list:
-            frame = int(key.replace("Frame", ""))
-            x = point["x_pos"]
-            y = point["y_pos"]
-            x_id = point["x_id"]
-            y_id = point["y_id"]
+    return (
+        np.concatenate([frames[:, None], positions], axis=1),
+        np.concatenate([frames[:, None], ids], axis=1),
+    )
 
-            positions.append(np.array([frame, x, y]))
-            ids.append(np.array([frame, x_id, y_id]))
 
-    return np.array(positions), np.array(ids)
+def cotracker_to_point_dict(per_frame_points: np.array, ids: np.array) -> dict:
+    # Points without an id are skipped, like zip() would.
+    ids = np.asarray(ids)
+    num_points = min(np.shape(per_frame_points)[1], len(ids))
 
+    # Convert to Python scalars once instead of calling .item() for every entry.
+    x_ids = ids[:num_points, 1].tolist()
+    y_ids = ids[:num_points, 0].tolist()
+    frame_points = np.asarray(per_frame_points)[:, :num_points].tolist()
 
-def cotracker_to_point_dict(per_frame_points: np.array, ids: np.array) -> dict:
     final_dict = {}
-    for frame_num, points in enumerate(per_frame_points):
-        point_list = []
-        for point, id in zip(points, ids):
-            point_dict = {
-                "x_pos": point[0].item(),
-                "y_pos": point[1].item(),
-                "x_id": id[1].item(),
-                "y_id": id[0].item(),
-            }
-            point_list.append(point_dict)
-        final_dict[f"Frame{frame_num}"] = point_list
+    for frame_num, points in enumerate(frame_points):
+        final_dict[f"Frame{frame_num}"] = [
+            {"x_pos": point[0], "y_pos": point[1], "x_id": x_id, "y_id": y_id}
+            for point, x_id, y_id in zip(points, x_ids, y_ids)
+        ]
     return final_dict
 
 
@@ -203,16 +442,14 @@ def cotracker_to_point_dict(per_frame_points: np.array, ids: np.array) -> dict:
 def cotracker_to_numpy_array(
     per_frame_points: np.array, ids: np.array, grid_width: int, grid_height: int
 ) -> np.array:
-    base = np.zeros([per_frame_points.shape[0], grid_height, grid_width, 2]) * np.nan
-
-    for frame, points in enumerate(per_frame_points):
-        for point, id in zip(points, ids):
-            x = point[0]
-            y = point[1]
-            x_id = id[0]
-            y_id = id[1]
+    per_frame_points = np.asarray(per_frame_points)
+    ids = np.asarray(ids).astype(int)
+    num_points = min(per_frame_points.shape[1], len(ids))
 
-            base[frame, y_id, x_id] = np.array([x, y])
+    base = np.zeros([per_frame_points.shape[0], grid_height, grid_width, 2]) * np.nan
+    base[:, ids[:num_points, 1], ids[:num_points, 0]] = per_frame_points[
+        :, :num_points, :2
+    ]
 
     return base
 
@@ -220,69 +457,135 @@ def cotracker_to_numpy_array(
 def labels_to_numpy_array(
     per_frame_labels: np.array, ids: np.array, grid_width: int, grid_height: int
 ) -> np.array:
+    per_frame_labels = np.asarray(per_frame_labels)
+    ids = np.asarray(ids).astype(int)
+    num_points = min(per_frame_labels.shape[1], len(ids))
+
     base = np.zeros([per_frame_labels.shape[0], grid_height, grid_width]) * np.nan
+    base[:, ids[:num_points, 1], ids[:num_points, 0]] = per_frame_labels[:, :num_points]
 
-    for frame, labels in enumerate(per_frame_labels):
-        for label, id in zip(labels, ids):
-            x_id = id[0]
-            y_id = id[1]
+    return base
 
-            base[frame, y_id, x_id] = label
 
-    return base
+def _iterate_visible_points(points: np.array) -> Iterator[Tuple[np.array, np.array]]:
+    # Yields the visible [x, y] positions and their [y_id, x_id] grid indices per frame,
+    # in the same row-major order as get_points_from_tensor and get_point_indices_from_tensor.
+    points = np.asarray(points)
+    visible = ~np.isnan(points).any(axis=-1)
+    frame_ids, y_ids, x_ids = np.nonzero(visible)
+    bounds = np.searchsorted(frame_ids, np.arange(len(points) + 1)).tolist()
+
+    for frame_index in range(len(points)):
+        start, end = bounds[frame_index], bounds[frame_index + 1]
+        yield (
+            points[frame_ids[start:end], y_ids[start:end], x_ids[start:end]],
+            np.stack([y_ids[start:end], x_ids[start:end]], axis=-1),
+        )
+
+
+def _point_list(positions: np.array, ids: np.array) -> List[dict]:
+    return [
+        {"x_pos": x, "y_pos": y, "x_id": x_id, "y_id": y_id}
+        for (x, y), (y_id, x_id) in zip(positions.tolist(), ids.tolist())
+    ]
+
+
+def _label_list(labels, ids: np.array) -> List[dict]:
+    return [
+        {"label": label, "x_id": x_id, "y_id": y_id}
+        for label, (y_id, x_id) in zip(np.asarray(labels).tolist(), ids.tolist())
+    ]
 
 
 def write_points_to_json(
     path: str, points: np.array, cycle_start: int = 0, save: bool = True
 ) -> dict:
-    video_dict = {}
-    for frame_index, per_frame_points in enumerate(points):
-        point_list = []
-        point_coordinates = VFLabel.cv.get_points_from_tensor(per_frame_points)
-        point_ids = VFLabel.cv.get_point_indices_from_tensor(per_frame_points)
-
-        for point, id in zip(point_coordinates, point_ids):
-            point_dict = {
-                "x_pos": point[0].item(),
-                "y_pos": point[1].item(),
-                "x_id": id[1].item(),
-                "y_id": id[0].item(),
-            }
-            point_list.append(point_dict)
-
-        video_dict[f"Frame{cycle_start + frame_index}"] = point_list
+    """
+    Convert a FRAMES x GRID_HEIGHT x GRID_WIDTH x 2 point array into the point JSON format.
+
+    If save is set, the frames are streamed to disk one at a time and no dict is built.
+
+    :param path: Path of the JSON file
+    :type path: str
+    :param points: Points of shape FRAMES x GRID_HEIGHT x GRID_WIDTH x 2, NaN where a point is missing
+    :type points: np.array
+    :param cycle_start: Frame number of the first frame
+    :type cycle_start: int
+    :param save: Whether the JSON is written to path
+    :type save: bool
+    :return: The point dict if save is not set, else None
+    :rtype: dict
+    """
+    frames = (
+        (f"Frame{cycle_start + frame_index}", _point_list(positions, ids))
+        for frame_index, (positions, ids) in enumerate(_iterate_visible_points(points))
+    )
 
-    if save:
-        write_json(path, video_dict)
+    if not save:
+        return dict(frames)
 
-    return video_dict
+    write_json_stream(path, frames)
 
 
 def write_visibility_to_json(
     path: str, visibility: np.array, points: np.array, cycle_start: int = 0
 ) -> None:
-    video_dict = {}
-    for frame_index, per_frame_points in enumerate(points):
-        label_list = []
-        label_values = visibility[frame_index]
-        point_ids = VFLabel.cv.get_point_indices_from_tensor(per_frame_points)
+    """
+    Write per frame labels into the visibility JSON format.
+
+    The labels of a frame are assigned to the visible points of that frame in row-major grid order.
+
+    :param path: Path of the JSON file
+    :type path: str
+    :param visibility: Per frame label lists
+    :type visibility: np.array
+    :param points: Points of shape FRAMES x GRID_HEIGHT x GRID_WIDTH x 2, NaN where a point is missing
+    :type points: np.array
+    :param cycle_start: Frame number of the first frame
+    :type cycle_start: int
+    """
+    frames = (
+        (f"Frame{cycle_start + frame_index}", _label_list(visibility[frame_index], ids))
+        for frame_index, (_, ids) in enumerate(_iterate_visible_points(points))
+    )
+
+    write_json_stream(path, frames)
+
 
-        for label, id in zip(label_values, point_ids):
-            point_dict = {
-                "label": label,
-                "x_id": id[1].item(),
-                "y_id": id[0].item(),
-            }
-            label_list.append(point_dict)
+def write_json_stream(filepath: str, items: Iterable[Tuple[str, object]]) -> None:
+    """
+    Write key value pairs as a JSON object without holding the whole object in memory.
 
-        video_dict[f"Frame{cycle_start + frame_index}"] = label_list
+    The output is identical to json.dump of the corresponding dict.
+    It is written to a temporary file first and then renamed,
+    such that a crash never leaves a half-written file behind.
 
-    write_json(path, video_dict)
+    :param filepath: Path of the JSON file
+    :type filepath: str
+    :param items: Key value pairs, e.g. a generator yielding one frame at a time
+    :type items: Iterable[Tuple[str, object]]
+    """
+    tmp_path = filepath + ".tmp"
+
+    try:
+        with open(tmp_path, "w") as outfile:
+            outfile.write("{")
+            for index, (key, value) in enumerate(items):
+                if index > 0:
+                    outfile.write(", ")
+                outfile.write(json.dumps(key))
+                outfile.write(": ")
+                outfile.write(json.dumps(value))
+            outfile.write("}")
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, filepath)
 
 
 def write_json(filepath: str, dict: dict) -> None:
-    with open(filepath, "w+") as outfile:
-        json.dump(dict, outfile)
+    write_json_stream(filepath, dict.items())
 
 
 if __name__ == "__main__":
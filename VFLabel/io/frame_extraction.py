@@ -0,0 +1,248 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, List
+
+import cv2
+import numpy as np
+
+import VFLabel.io.frame_store as frame_store
+
+# raw:  all frames are written into a single frame store file
+# png:  one PNG per frame with a configurable compression level
+# webp: one lossless WebP per frame
+FRAME_CODECS: List[str] = ["raw", "png", "webp"]
+
+_CODEC_EXTENSIONS = {"png": ".png", "webp": ".webp"}
+
+
+def codec_parameters(codec: str, png_compression: int = 1) -> List[int]:
+    """
+    Return the cv2.imwrite parameters for an image codec.
+
+    :param codec: One of "png" or "webp"
+    :type codec: str
+    :param png_compression: PNG compression level between 0 (fastest) and 9 (smallest)
+    :type png_compression: int
+    :return: Parameters that can be passed to cv2.imwrite
+    :rtype: List[int]
+    """
+    if codec == "png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+
+    if codec == "webp":
+        # A quality above 100 selects lossless WebP.
+        return [cv2.IMWRITE_WEBP_QUALITY, 101]
+
+    raise ValueError(f"Unknown image codec {codec}, expected one of {FRAME_CODECS}.")
+
+
+def _decode_frames(
+    video_path: str, frame_queue: queue.Queue, stop_event: threading.Event
+) -> None:
+    cap = cv2.VideoCapture(video_path)
+
+    try:
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            # Blocks while the queue is full, such that decoding never runs ahead
+            # of encoding by more than the queue size.
+            while not stop_event.is_set():
+                try:
+                    frame_queue.put(frame, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+    finally:
+        cap.release()
+        frame_queue.put(None)
+
+
+def extract_frames(
+    video_path: str,
+    output_path: str,
+    codec: str = "raw",
+    png_compression: int = 1,
+    num_workers: int = None,
+    queue_size: int = 32,
+    progress_interval: int = 64,
+    progress_callback: Callable[[int, int], None] = None,
+    stop_event: threading.Event = None,
+) -> int:
+    """
+    Decode a video and write its frames to disk.
+
+    A single decoder thread feeds frames through a bounded queue.
+    Raw frames are appended to a frame store directly, while PNG and WebP frames
+    are encoded in parallel by a pool of threads, since cv2 releases the GIL while encoding.
+    Threads share the frames without copying them and are safe to start from a QThread.
+
+    :param video_path: Path to the video file
+    :type video_path: str
+    :param output_path: Path of the frame store for "raw", else the folder the images are written into
+    :type output_path: str
+    :param codec: One of :data:`FRAME_CODECS`
+    :type codec: str
+    :param png_compression: PNG compression level between 0 (fastest) and 9 (smallest)
+    :type png_compression: int
+    :param num_workers: Number of encoder threads, defaults to the number of cores
+    :type num_workers: int
+    :param queue_size: Maximum number of decoded frames that wait for being written
+    :type queue_size: int
+    :param progress_interval: Number of written frames between two progress reports
+    :type progress_interval: int
+    :param progress_callback: Called with the number of written frames and the total number of frames
+    :type progress_callback: Callable[[int, int], None]
+    :param stop_event: If set, extraction stops after the frames that are currently being encoded
+    :type stop_event: threading.Event
+    :raises ValueError: If the video can't be opened or contains no frames
+    :raises OSError: If a frame can't be written
+    :raises InterruptedError: If extraction got stopped, an unfinished frame store is removed
+    :return: Number of written frames
+    :rtype: int
+    """
+    if codec not in FRAME_CODECS:
+        raise ValueError(
+            f"Unknown frame codec {codec}, expected one of {FRAME_CODECS}."
+        )
+
+    cap = cv2.VideoCapture(video_path)
+    is_opened = cap.isOpened()
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    if not is_opened:
+        raise ValueError(f"Video {video_path} couldn't be opened.")
+
+    stop_event = stop_event if stop_event is not None else threading.Event()
+    frame_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+
+    executor = None
+    if codec != "raw":
+        num_workers = num_workers if num_workers else os.cpu_count()
+        executor = ThreadPoolExecutor(max_workers=num_workers)
+
+    decoder = threading.Thread(
+        target=_decode_frames, args=(video_path, frame_queue, stop_event), daemon=True
+    )
+    decoder.start()
+
+    def report(num_written: int, is_done: bool = False) -> None:
+        # Report once per batch of frames, such that the UI isn't flooded with signals.
+        if progress_callback and (is_done or num_written % progress_interval == 0):
+            progress_callback(num_written, max(total_frames, num_written))
+
+    try:
+        if codec == "raw":
+            num_written = _write_raw(output_path, frame_queue, stop_event, report)
+        else:
+            num_written = _write_images(
+                output_path,
+                frame_queue,
+                stop_event,
+                report,
+                executor,
+                num_workers,
+                _CODEC_EXTENSIONS[codec],
+                codec_parameters(codec, png_compression),
+            )
+        report(num_written, is_done=True)
+    finally:
+        # Unblocks the decoder, if writing failed or got stopped.
+        stop_event.set()
+        while decoder.is_alive():
+            try:
+                frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        decoder.join()
+
+        if executor is not None:
+            executor.shutdown()
+
+    return num_written
+
+
+def _write_raw(
+    output_path: str,
+    frame_queue: queue.Queue,
+    stop_event: threading.Event,
+    report: Callable[[int], None],
+) -> int:
+    # Raising inside the writer removes the temporary file instead of committing it.
+    with frame_store.FrameStoreWriter(output_path) as writer:
+        while True:
+            frame = frame_queue.get()
+            if frame is None:
+                break
+
+            if stop_event.is_set():
+                raise InterruptedError("Frame extraction was stopped.")
+
+            writer.write(frame)
+            report(writer.num_frames)
+
+        # The decoder also ends with None when it got stopped.
+        _check_finished(writer.num_frames, stop_event)
+
+    return writer.num_frames
+
+
+def _write_images(
+    output_folder: str,
+    frame_queue: queue.Queue,
+    stop_event: threading.Event,
+    report: Callable[[int], None],
+    executor: ThreadPoolExecutor,
+    num_workers: int,
+    extension: str,
+    params: List[int],
+) -> int:
+    os.makedirs(output_folder, exist_ok=True)
+
+    num_submitted = 0
+    num_written = 0
+    pending: Deque[Future] = deque()
+
+    while not stop_event.is_set():
+        frame = frame_queue.get()
+        if frame is None:
+            break
+
+        frame_path = os.path.join(output_folder, f"{num_submitted:05d}{extension}")
+        pending.append(executor.submit(_write_image, frame_path, frame, params))
+        num_submitted += 1
+
+        # Bound the number of frames that are in flight to the encoder threads.
+        while len(pending) > 2 * num_workers:
+            pending.popleft().result()
+            num_written += 1
+            report(num_written)
+
+    while pending:
+        pending.popleft().result()
+        num_written += 1
+        report(num_written)
+
+    _check_finished(num_written, stop_event)
+
+    return num_written
+
+
+def _write_image(path: str, frame: np.array, params: List[int]) -> None:
+    # cv2.imwrite reports failures, e.g. a full disk, only through its return value.
+    if not cv2.imwrite(path, frame, params):
+        raise OSError(f"Frame {path} couldn't be written.")
+
+
+def _check_finished(num_written: int, stop_event: threading.Event) -> None:
+    if stop_event.is_set():
+        raise InterruptedError("Frame extraction was stopped.")
+
+    if num_written == 0:
+        raise ValueError("The video contains no frames that could be decoded.")
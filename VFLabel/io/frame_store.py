@@ -0,0 +1,212 @@
+import os
+import struct
+import zlib
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+# A frame store is a single file holding a fixed size header followed by the raw
+# uint8 frames of a video in FRAMES x HEIGHT x WIDTH x CHANNELS order.
+# It is written once when a project is created and then memory-mapped by every view.
+FRAME_STORE_FILENAME: str = "video.frames"
+FRAME_STORE_MAGIC: bytes = b"HASELFS\x00"
+FRAME_STORE_VERSION: int = 2
+FRAME_STORE_HEADER_SIZE: int = 64
+
+# magic, version, num_frames, height, width, channels, CRC32 of the frames
+# Version 1 headers end before the checksum.
+_HEADER_FORMAT: str = "<8sIQIIII"
+_HEADER_FORMAT_V1: str = "<8sIQIII"
+
+
+def _pack_header(
+    num_frames: int, height: int, width: int, channels: int, checksum: int = 0
+) -> bytes:
+    header = struct.pack(
+        _HEADER_FORMAT,
+        FRAME_STORE_MAGIC,
+        FRAME_STORE_VERSION,
+        num_frames,
+        height,
+        width,
+        channels,
+        checksum,
+    )
+    return header.ljust(FRAME_STORE_HEADER_SIZE, b"\x00")
+
+
+def _unpack_header(path: str) -> Tuple[int, int, int, int, Optional[int]]:
+    with open(path, "rb") as f:
+        header = f.read(FRAME_STORE_HEADER_SIZE)
+
+    if len(header) != FRAME_STORE_HEADER_SIZE:
+        raise ValueError(f"{path} is too small to be a frame store.")
+
+    magic, version = struct.unpack_from("<8sI", header)
+
+    if magic != FRAME_STORE_MAGIC:
+        raise ValueError(f"{path} is not a frame store.")
+
+    if version == 1:
+        return (*struct.unpack_from(_HEADER_FORMAT_V1, header)[2:], None)
+
+    if version != FRAME_STORE_VERSION:
+        raise ValueError(f"Unsupported frame store version {version} in {path}.")
+
+    return struct.unpack_from(_HEADER_FORMAT, header)[2:]
+
+
+def read_frame_store_header(path: str) -> Tuple[int, int, int, int]:
+    """
+    Read the header of a frame store.
+
+    :param path: Path to the frame store file
+    :type path: str
+    :raises ValueError: If the file is not a frame store or has an unknown version
+    :return: Shape of the stored video as (frames, height, width, channels)
+    :rtype: Tuple[int, int, int, int]
+    """
+    return _unpack_header(path)[:4]
+
+
+def read_frame_store_checksum(path: str) -> Optional[int]:
+    """
+    Read the CRC32 of the frames that was taken while the frame store was written.
+
+    Version 1 frame stores were written before the checksum was recorded and have none.
+
+    :param path: Path to the frame store file
+    :type path: str
+    :raises ValueError: If the file is not a frame store or has an unknown version
+    :return: CRC32 of the frame bytes, or None for version 1 frame stores
+    :rtype: Optional[int]
+    """
+    return _unpack_header(path)[4]
+
+
+class FrameStoreWriter:
+    """
+    Sequentially writes frames into a frame store.
+
+    Frames are appended to a temporary file, which is moved to its final location
+    once :meth:`close` wrote the final frame count into the header.
+    A crash during writing therefore never leaves a truncated frame store behind.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self._tmp_path: str = path + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(_pack_header(0, 0, 0, 0))
+        self.frame_shape: Tuple[int, int, int] = None
+        self.num_frames: int = 0
+        self.checksum: int = 0
+
+    def write(self, frame: np.array) -> None:
+        """
+        Append a single frame.
+
+        :param frame: Frame of shape HEIGHT x WIDTH (x CHANNELS)
+        :type frame: np.array
+        :raises ValueError: If the frame shape differs from the first written frame
+        """
+        if frame.ndim == 2:
+            frame = frame[:, :, None]
+
+        if self.frame_shape is None:
+            self.frame_shape = frame.shape
+        elif frame.shape != self.frame_shape:
+            raise ValueError(
+                f"Frame {self.num_frames} has shape {frame.shape}, expected {self.frame_shape}."
+            )
+
+        data = np.ascontiguousarray(frame, dtype=np.uint8).tobytes()
+        self._file.write(data)
+        self.checksum = zlib.crc32(data, self.checksum)
+        self.num_frames += 1
+
+    def close(self) -> None:
+        """
+        Finalize the header and move the frame store to its final path.
+
+        The header records the frame count and the CRC32 of all frames,
+        such that the frame store never needs to be read again to check it.
+        """
+        if self._file.closed:
+            return
+
+        height, width, channels = self.frame_shape if self.frame_shape else (0, 0, 0)
+        self._file.seek(0)
+        self._file.write(
+            _pack_header(self.num_frames, height, width, channels, self.checksum)
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        """
+        Stop writing and remove the temporary file.
+        """
+        if not self._file.closed:
+            self._file.close()
+
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_frame_store(path: str, frames: Iterable[np.array]) -> int:
+    """
+    Write all frames of an iterable into a new frame store.
+
+    :param path: Path of the frame store file
+    :type path: str
+    :param frames: Frames of shape HEIGHT x WIDTH (x CHANNELS), e.g. a video array or a frame generator
+    :type frames: Iterable[np.array]
+    :return: Number of written frames
+    :rtype: int
+    """
+    with FrameStoreWriter(path) as writer:
+        for frame in frames:
+            writer.write(frame)
+
+    return writer.num_frames
+
+
+def open_frame_store(path: str, mode: str = "c") -> np.memmap:
+    """
+    Memory-map a frame store without reading it into memory.
+
+    The default copy-on-write mode allows views to modify frames in memory without
+    touching the file on disk.
+
+    :param path: Path to the frame store file
+    :type path: str
+    :param mode: Memory-map mode, see :class:`numpy.memmap`
+    :type mode: str
+    :raises ValueError: If the file is smaller than announced by its header
+    :return: Array of shape FRAMES x HEIGHT x WIDTH x CHANNELS
+    :rtype: np.memmap
+    """
+    shape = read_frame_store_header(path)
+    expected_size = FRAME_STORE_HEADER_SIZE + int(np.prod(shape))
+
+    if os.path.getsize(path) < expected_size:
+        raise ValueError(f"Frame store {path} is truncated.")
+
+    if shape[0] == 0:
+        return np.zeros(shape, dtype=np.uint8)
+
+    return np.memmap(
+        path, dtype=np.uint8, mode=mode, offset=FRAME_STORE_HEADER_SIZE, shape=shape
+    )
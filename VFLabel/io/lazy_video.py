@@ -0,0 +1,156 @@
+from collections import OrderedDict
+from typing import Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+
+class LazyVideo:
+    """
+    Video that is decoded on demand instead of being read into memory as a whole.
+
+    Frames are decoded in chunks of consecutive frames, of which at most
+    ``max_cached_chunks`` are kept in a least-recently-used cache.
+    Memory usage is therefore bounded by ``chunk_size * max_cached_chunks`` frames,
+    independent of the length of the recording.
+    Indexing follows NumPy semantics for the frame axis, i.e. ``video[10]``,
+    ``video[10:20]``, ``video[[1, 5, 7]]`` and ``video[:, :, :, :1]`` are supported.
+
+    :param path: Path to the video file
+    :type path: str
+    :param chunk_size: Number of consecutive frames that are decoded at once
+    :type chunk_size: int
+    :param max_cached_chunks: Maximum number of chunks kept in memory
+    :type max_cached_chunks: int
+    """
+
+    def __init__(self, path: str, chunk_size: int = 64, max_cached_chunks: int = 8):
+        self.path: str = path
+        self.chunk_size: int = chunk_size
+        self.max_cached_chunks: int = max_cached_chunks
+
+        self._capture = cv2.VideoCapture(path)
+        if not self._capture.isOpened():
+            raise ValueError(f"Video couldn't be opened! Path might be wrong: {path}")
+
+        # The frame count stored in the container may be too large for some codecs.
+        # It gets corrected once the last chunk has been decoded.
+        self._num_frames: int = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self._next_frame: int = 0
+        self._chunks: OrderedDict[int, np.array] = OrderedDict()
+
+        first_chunk = self._load_chunk(0)
+        self._frame_shape: Tuple[int, ...] = first_chunk.shape[1:]
+        self.dtype = first_chunk.dtype
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return (self._num_frames, *self._frame_shape)
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def __len__(self) -> int:
+        return self._num_frames
+
+    def __iter__(self) -> Iterator[np.array]:
+        frame_index = 0
+
+        # The length may shrink while iterating, if the container overestimated it.
+        while frame_index < len(self):
+            try:
+                frame = self[frame_index]
+            except IndexError:
+                return
+
+            yield frame
+            frame_index += 1
+
+    def __array__(self, dtype=None, copy=None) -> np.array:
+        video = self[:]
+        return video if dtype is None else video.astype(dtype)
+
+    def __getitem__(self, key) -> np.array:
+        if isinstance(key, tuple):
+            frames = self[key[0]]
+            if frames.ndim == len(self.shape):
+                return frames[(slice(None), *key[1:])]
+            return frames[key[1:]]
+
+        if isinstance(key, (int, np.integer)):
+            frame_index = self._normalize_index(int(key))
+            chunk = self._load_chunk(frame_index // self.chunk_size)
+            return chunk[frame_index % self.chunk_size].copy()
+
+        if isinstance(key, slice):
+            indices = list(range(*key.indices(len(self))))
+        else:
+            indices = [self._normalize_index(int(i)) for i in np.asarray(key).ravel()]
+
+        return self._gather(indices)
+
+    def _normalize_index(self, frame_index: int) -> int:
+        if frame_index < 0:
+            frame_index += len(self)
+
+        if not 0 <= frame_index < len(self):
+            raise IndexError(
+                f"Frame {frame_index} is out of bounds for video of length {len(self)}."
+            )
+
+        return frame_index
+
+    def _gather(self, indices: List[int]) -> np.array:
+        frames = np.empty([len(indices), *self._frame_shape], dtype=self.dtype)
+
+        for out_index, frame_index in enumerate(indices):
+            try:
+                chunk = self._load_chunk(frame_index // self.chunk_size)
+                frames[out_index] = chunk[frame_index % self.chunk_size]
+            except IndexError:
+                # The container overestimated the number of frames.
+                return frames[:out_index]
+
+        return frames
+
+    def _load_chunk(self, chunk_index: int) -> np.array:
+        if chunk_index in self._chunks:
+            self._chunks.move_to_end(chunk_index)
+            return self._chunks[chunk_index]
+
+        start = chunk_index * self.chunk_size
+
+        # Only seek if we do not continue reading where the last chunk ended.
+        # Sequential access thus never pays for seeking.
+        if start != self._next_frame:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+        frames = []
+        for _ in range(self.chunk_size):
+            ret, frame = self._capture.read()
+            if not ret:
+                break
+            frames.append(frame)
+
+        self._next_frame = start + len(frames)
+
+        if len(frames) < self.chunk_size:
+            self._num_frames = self._next_frame
+
+        if len(frames) == 0:
+            raise IndexError(f"Chunk {chunk_index} is out of bounds for {self.path}.")
+
+        chunk = np.stack(frames)
+        self._chunks[chunk_index] = chunk
+        if len(self._chunks) > self.max_cached_chunks:
+            self._chunks.popitem(last=False)
+
+        return chunk
+
+    def release(self) -> None:
+        """
+        Release the underlying video capture and empty the cache.
+        """
+        self._capture.release()
+        self._chunks.clear()
@@ -0,0 +1,247 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+import VFLabel.io.data as data
+import VFLabel.io.project as project
+
+# Point tracks are stored as two sections of the project manifest
+#   <name>_points: float32 FRAMES x GRID_HEIGHT x GRID_WIDTH x 2, NaN where a laserpoint is missing
+#   <name>_labels: uint8 FRAMES x GRID_HEIGHT x GRID_WIDTH, POINT_TRACKS_LABEL_UNSET where no label exists
+# and optionally the query points they were tracked from
+#   <name>_queries: float32 NUM_POINTS x 5 as [frame, x, y, x_id, y_id]
+# whose "key" attribute identifies the video and tracking parameters, see VFLabel.nn.tracking_cache.
+# This replaces parsing millions of small JSON objects when a project is reopened.
+POINT_TRACKS_LABEL_UNSET: int = 255
+
+
+def write_point_tracks(
+    project_container: project.Project,
+    name: str,
+    points: np.array,
+    labels: np.array = None,
+) -> None:
+    """
+    Store point tracks and their per frame labels in a project.
+
+    :param project_container: Project the tracks are stored in
+    :type project_container: project.Project
+    :param name: Name of the tracks, e.g. "predicted"
+    :type name: str
+    :param points: Point positions of shape FRAMES x GRID_HEIGHT x GRID_WIDTH x 2
+    :type points: np.array
+    :param labels: Labels of shape FRAMES x GRID_HEIGHT x GRID_WIDTH, NaN where unset
+    :type labels: np.array
+    """
+    points = np.asarray(points, dtype=np.float32)
+
+    if labels is None:
+        labels_uint8 = np.full(points.shape[:-1], POINT_TRACKS_LABEL_UNSET, np.uint8)
+    else:
+        labels = np.asarray(labels, dtype=float)
+        labels_uint8 = np.where(
+            np.isnan(labels), POINT_TRACKS_LABEL_UNSET, labels
+        ).astype(np.uint8)
+
+    project_container.write_arrays(
+        {f"{name}_points": points, f"{name}_labels": labels_uint8}
+    )
+
+
+def has_point_tracks(project_container: project.Project, name: str) -> bool:
+    """
+    Check whether a project contains point tracks of the given name.
+
+    :param project_container: Project to check
+    :type project_container: project.Project
+    :param name: Name of the tracks, e.g. "predicted"
+    :type name: str
+    :return: True if both points and labels are stored
+    :rtype: bool
+    """
+    return (
+        f"{name}_points" in project_container and f"{name}_labels" in project_container
+    )
+
+
+def read_point_tracks(
+    project_container: project.Project, name: str
+) -> Tuple[np.array, np.array]:
+    """
+    Read point tracks that were stored with :func:`write_point_tracks`.
+
+    :param project_container: Project the tracks are stored in
+    :type project_container: project.Project
+    :param name: Name of the tracks, e.g. "predicted"
+    :type name: str
+    :return: Points of shape FRAMES x GRID_HEIGHT x GRID_WIDTH x 2 and labels of shape FRAMES x GRID_HEIGHT x GRID_WIDTH, where unset labels are NaN
+    :rtype: Tuple[np.array, np.array]
+    """
+    points = project_container[f"{name}_points"]
+    labels_uint8 = project_container[f"{name}_labels"]
+
+    labels = labels_uint8.astype(np.float32)
+    labels[labels_uint8 == POINT_TRACKS_LABEL_UNSET] = np.nan
+
+    return points, labels
+
+
+def write_point_track_queries(
+    project_container: project.Project,
+    name: str,
+    query_points: np.array,
+    ids: np.array,
+    key: str = None,
+) -> None:
+    """
+    Store the query points point tracks were tracked from, such that later runs can re-track only changed points.
+
+    :param project_container: Project the queries are stored in
+    :type project_container: project.Project
+    :param name: Name of the tracks, e.g. "predicted"
+    :type name: str
+    :param query_points: Query points of shape NUM_POINTS x 3 as [frame, x, y]
+    :type query_points: np.array
+    :param ids: [x_id, y_id] of shape NUM_POINTS x 2
+    :type ids: np.array
+    :param key: Identifies everything else the tracks depend on, e.g. the video and the tracking parameters
+    :type key: str
+    """
+    queries = np.concatenate(
+        [np.asarray(query_points, dtype=np.float32), np.asarray(ids, np.float32)],
+        axis=1,
+    )
+    project_container.write_array(
+        f"{name}_queries", queries.reshape(-1, 5), attributes={"key": key}
+    )
+
+
+def read_point_track_queries(
+    project_container: project.Project, name: str
+) -> Optional[Tuple[np.array, np.array]]:
+    """
+    Read the query points that were stored with :func:`write_point_track_queries`.
+
+    :param project_container: Project the queries are stored in
+    :type project_container: project.Project
+    :param name: Name of the tracks, e.g. "predicted"
+    :type name: str
+    :return: Query points of shape NUM_POINTS x 3 as [frame, x, y] and [x_id, y_id] of shape NUM_POINTS x 2, None if no queries are stored
+    :rtype: Optional[Tuple[np.array, np.array]]
+    """
+    if f"{name}_queries" not in project_container:
+        return None
+
+    queries = np.asarray(project_container[f"{name}_queries"])
+    return queries[:, :3].astype(float), queries[:, 3:].astype(int)
+
+
+def read_point_track_queries_key(
+    project_container: project.Project, name: str
+) -> Optional[str]:
+    """
+    Read the key that was stored with :func:`write_point_track_queries`.
+
+    :param project_container: Project the queries are stored in
+    :type project_container: project.Project
+    :param name: Name of the tracks, e.g. "predicted"
+    :type name: str
+    :return: The key, None if no queries or no key are stored
+    :rtype: Optional[str]
+    """
+    if f"{name}_queries" not in project_container:
+        return None
+
+    return project_container.info(f"{name}_queries")["attributes"].get("key")
+
+
+def point_tracks_to_point_lists(
+    points: np.array, labels: np.array
+) -> Tuple[np.array, np.array, np.array]:
+    """
+    Convert point tracks into the per frame point lists used by the LabeledPoints widget.
+
+    Every laserpoint that is visible in at least one frame gets a column.
+
+    :param points: Points of shape FRAMES x GRID_HEIGHT x GRID_WIDTH x 2
+    :type points: np.array
+    :param labels: Labels of shape FRAMES x GRID_HEIGHT x GRID_WIDTH
+    :type labels: np.array
+    :return: Positions of shape FRAMES x NUM_POINTS x 2, labels of shape FRAMES x NUM_POINTS and [x_id, y_id] of shape NUM_POINTS x 2
+    :rtype: Tuple[np.array, np.array, np.array]
+    """
+    is_visible = ~np.isnan(points).any(axis=-1)
+    cells = np.argwhere(is_visible.any(axis=0))
+    y_ids, x_ids = cells[:, 0], cells[:, 1]
+
+    return (
+        points[:, y_ids, x_ids].astype(float),
+        labels[:, y_ids, x_ids].astype(float),
+        np.stack([x_ids, y_ids], axis=-1),
+    )
+
+
+def point_tracks_from_json(
+    points_path: str,
+    grid_width: int,
+    grid_height: int,
+    video_length: int,
+    labels_path: str = None,
+) -> Tuple[np.array, np.array]:
+    """
+    Import point tracks from the JSON files written by :func:`write_points_to_json`
+    and :func:`write_visibility_to_json`.
+
+    :param points_path: Path to the points JSON file
+    :type points_path: str
+    :param grid_width: Width of the laser grid
+    :type grid_width: int
+    :param grid_height: Height of the laser grid
+    :type grid_height: int
+    :param video_length: Number of frames
+    :type video_length: int
+    :param labels_path: Optional path to the labels JSON file
+    :type labels_path: str
+    :return: Points of shape FRAMES x GRID_HEIGHT x GRID_WIDTH x 2 and labels of shape FRAMES x GRID_HEIGHT x GRID_WIDTH
+    :rtype: Tuple[np.array, np.array]
+    """
+    points = data.point_dict_to_numpy(
+        data.dict_from_json(points_path), grid_width, grid_height, video_length
+    )
+    labels = np.zeros(points.shape[:-1]) * np.nan
+
+    if labels_path is None:
+        return points, labels
+
+    for key, label_list in data.dict_from_json(labels_path).items():
+        frame = int(key.replace("Frame", ""))
+        for label in label_list:
+            labels[frame, label["y_id"], label["x_id"]] = label["label"]
+
+    return points, labels
+
+
+def point_tracks_to_json(
+    points_path: str, labels_path: str, points: np.array, labels: np.array
+) -> None:
+    """
+    Export point tracks into the JSON files used by earlier versions of the project layout.
+
+    :param points_path: Path of the points JSON file
+    :type points_path: str
+    :param labels_path: Path of the labels JSON file
+    :type labels_path: str
+    :param points: Points of shape FRAMES x GRID_HEIGHT x GRID_WIDTH x 2
+    :type points: np.array
+    :param labels: Labels of shape FRAMES x GRID_HEIGHT x GRID_WIDTH
+    :type labels: np.array
+    """
+    data.write_points_to_json(points_path, points)
+
+    # Labels are stored in the same order as the visible points of each frame.
+    visible = ~np.isnan(points).any(axis=-1)
+    per_frame_labels = [
+        frame_labels[frame_visible].tolist()
+        for frame_labels, frame_visible in zip(labels, visible)
+    ]
+    data.write_visibility_to_json(labels_path, per_frame_labels, points)
@@ -0,0 +1,492 @@
+import contextlib
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# The manifest indexes the artifacts of a project, i.e. the frame store, point tracks,
+# segmentation masks, cached tracking results and the JSON exports. Each section records
+#   kind:     "array" for raw NumPy data, "json" for a JSON export
+#   file:     file holding the section, relative to the project folder
+#   offset:   byte offset of the section inside that file
+#   size:     number of bytes of the section
+#   shape:    array shape, None for JSON
+#   dtype:    NumPy dtype string, None for JSON
+#   checksum: CRC32 of the section bytes, None if it was not recorded
+#   attributes: optional metadata of the section, e.g. the unpacked width of bitmasks
+# JSON exports are named after their file, e.g. "clicked_laserpoints.json". The views
+# still write them directly, so their entries are re-indexed when the file changed.
+# Only the manifest is read when a project is opened. Sections are loaded on first access.
+# Arrays written by the project itself live in a sections file, whose name changes with
+# every compaction, such that the manifest always points to a complete file.
+#
+# Several Project instances, possibly in several processes, may use the same folder.
+# Every mutation therefore re-reads the manifest while holding the manifest lock,
+# and readers pick up manifest changes on their next access.
+PROJECT_MANIFEST_FILENAME: str = "manifest.json"
+PROJECT_LOCK_FILENAME: str = "manifest.lock"
+PROJECT_SECTIONS_PREFIX: str = "project"
+PROJECT_MANIFEST_VERSION: int = 1
+
+# Array sections inside the sections file start at multiples of this alignment.
+_SECTION_ALIGNMENT: int = 64
+_CHECKSUM_CHUNK_SIZE: int = 1 << 24
+
+
+# Serializes the threads of this process, the file lock serializes processes.
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _manifest_lock(path: str) -> Iterator[None]:
+    with _thread_locks_lock:
+        thread_lock = _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+    with thread_lock, open(os.path.join(path, PROJECT_LOCK_FILENAME), "a+b") as f:
+        if os.name == "nt":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _file_checksum(path: str, offset: int, size: int) -> int:
+    checksum = 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        remaining = size
+        while remaining > 0:
+            chunk = f.read(min(remaining, _CHECKSUM_CHUNK_SIZE))
+            if not chunk:
+                break
+            checksum = zlib.crc32(chunk, checksum)
+            remaining -= len(chunk)
+
+    return checksum
+
+
+class Project:
+    """
+    Container for the artifacts of a project, indexed by a single manifest.
+
+    Arrays written with :meth:`write_array` are appended to one sections file and
+    memory-mapped on first access. Existing files, e.g. the frame store,
+    can be indexed with :meth:`register_file`, JSON exports with :meth:`register_json`.
+    Opening a project therefore only reads the manifest, and accessing a section
+    only touches the bytes of that section.
+
+    :param path: Path to the project folder
+    :type path: str
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self._manifest_path: str = os.path.join(path, PROJECT_MANIFEST_FILENAME)
+        self._manifest_stat: Tuple[int, int, int] = None
+        self._sections: Dict[str, Dict[str, Any]] = {}
+        self._loaded: Dict[str, Any] = {}
+        self._generation: int = 0
+
+        self._refresh()
+
+    def __contains__(self, name: str) -> bool:
+        self._refresh()
+        return name in self._sections
+
+    def __getitem__(self, name: str) -> Any:
+        return self.load(name)
+
+    def names(self) -> List[str]:
+        self._refresh()
+        return list(self._sections.keys())
+
+    def info(self, name: str) -> Dict[str, Any]:
+        """
+        Return the manifest entry of a section without loading it.
+
+        :param name: Name of the section
+        :type name: str
+        :return: Kind, file, offset, size, shape, dtype, checksum and attributes of the section
+        :rtype: Dict[str, Any]
+        """
+        self._refresh()
+        return dict(self._sections[name])
+
+    def load(self, name: str, verify: bool = False) -> Any:
+        """
+        Load a section, or return it from the cache if it was loaded before.
+
+        Array sections are returned as copy-on-write memory maps,
+        such that modifying them never touches the project on disk.
+        JSON sections are parsed, empty JSON files load as None.
+
+        :param name: Name of the section
+        :type name: str
+        :param verify: Whether the checksum of the section is verified before loading
+        :type verify: bool
+        :raises KeyError: If the project has no such section
+        :raises ValueError: If the section is truncated or its checksum does not match
+        :return: Memory map of the section, or the parsed JSON
+        :rtype: Any
+        """
+        self._refresh()
+        if name in self._sections and self._sections[name]["kind"] == "json":
+            self._sync_json(name)
+
+        if name in self._loaded and not verify:
+            return self._loaded[name]
+
+        section = self._sections[name]
+        file_path = os.path.join(self.path, section["file"])
+
+        if verify and not self.verify(name):
+            raise ValueError(f"Checksum mismatch in section {name} of {self.path}.")
+
+        if section["kind"] == "json":
+            with open(file_path) as f:
+                value = json.load(f) if section["size"] else None
+        elif os.path.getsize(file_path) < section["offset"] + section["size"]:
+            raise ValueError(f"Section {name} of {self.path} is truncated.")
+        elif section["size"] == 0:
+            value = np.zeros(section["shape"], dtype=section["dtype"])
+        else:
+            value = np.memmap(
+                file_path,
+                dtype=section["dtype"],
+                mode="c",
+                offset=section["offset"],
+                shape=tuple(section["shape"]),
+            )
+
+        self._loaded[name] = value
+        return value
+
+    def verify(self, name: str) -> bool:
+        """
+        Check whether the bytes of a section still match the checksum in the manifest.
+
+        Sections without a recorded checksum can't be verified and always pass.
+
+        :param name: Name of the section
+        :type name: str
+        :return: True if the checksum matches
+        :rtype: bool
+        """
+        self._refresh()
+        section = self._sections[name]
+        if section["checksum"] is None:
+            return True
+
+        file_path = os.path.join(self.path, section["file"])
+        checksum = _file_checksum(file_path, section["offset"], section["size"])
+        return checksum == section["checksum"]
+
+    def write_array(
+        self, name: str, array: np.array, attributes: Dict[str, Any] = None
+    ) -> None:
+        """
+        Store an array in the sections file of the project.
+
+        The array is appended to the sections file and the manifest is updated afterwards,
+        such that a crash leaves the previous version of the section intact.
+        Space of replaced sections is reclaimed once it exceeds the space in use.
+
+        :param name: Name of the section
+        :type name: str
+        :param array: Array to store
+        :type array: np.array
+        :param attributes: Optional JSON serializable metadata stored with the section
+        :type attributes: Dict[str, Any]
+        """
+        self.write_arrays({name: array}, attributes)
+
+    def write_arrays(
+        self, arrays: Dict[str, np.array], attributes: Dict[str, Any] = None
+    ) -> None:
+        """
+        Store several arrays with a single manifest update, see :meth:`write_array`.
+
+        Either all or none of the sections are replaced, such that sections that belong
+        together, e.g. points and their labels, never get out of sync.
+
+        :param arrays: Arrays to store by section name
+        :type arrays: Dict[str, np.array]
+        :param attributes: Optional JSON serializable metadata stored with every section
+        :type attributes: Dict[str, Any]
+        """
+        with _manifest_lock(self.path):
+            self._read_manifest()
+            sections_file = self._sections_file(self._generation)
+            sections_path = os.path.join(self.path, sections_file)
+            sections = {}
+
+            with open(sections_path, "ab") as f:
+                for name, array in arrays.items():
+                    array = np.ascontiguousarray(array)
+                    offset = f.tell()
+                    padding = -offset % _SECTION_ALIGNMENT
+                    f.write(b"\x00" * padding)
+                    offset += padding
+
+                    data = array.tobytes()
+                    f.write(data)
+                    sections[name] = {
+                        "kind": "array",
+                        "file": sections_file,
+                        "offset": offset,
+                        "size": len(data),
+                        "shape": list(array.shape),
+                        "dtype": array.dtype.str,
+                        "checksum": zlib.crc32(data),
+                        "attributes": (
+                            dict(attributes) if attributes is not None else {}
+                        ),
+                    }
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._sections.update(sections)
+            for name in sections:
+                self._loaded.pop(name, None)
+            self._write_manifest()
+            self._compact_if_needed()
+
+    def register_file(
+        self,
+        name: str,
+        filename: str,
+        shape: Tuple[int, ...],
+        dtype: str,
+        offset: int = 0,
+        checksum: int = None,
+    ) -> None:
+        """
+        Index raw array data inside an existing file of the project, e.g. the frame store.
+
+        The file is not read, the checksum should be taken when the file is written.
+
+        :param name: Name of the section
+        :type name: str
+        :param filename: File name relative to the project folder
+        :type filename: str
+        :param shape: Shape of the stored array
+        :type shape: Tuple[int, ...]
+        :param dtype: NumPy dtype of the stored array
+        :type dtype: str
+        :param offset: Byte offset of the array inside the file
+        :type offset: int
+        :param checksum: CRC32 of the array bytes, None if unknown
+        :type checksum: int
+        """
+        dtype = np.dtype(dtype)
+
+        with _manifest_lock(self.path):
+            self._read_manifest()
+            self._sections[name] = {
+                "kind": "array",
+                "file": filename,
+                "offset": offset,
+                "size": int(np.prod(shape)) * dtype.itemsize,
+                "shape": list(shape),
+                "dtype": dtype.str,
+                "checksum": checksum,
+                "attributes": {},
+            }
+            self._loaded.pop(name, None)
+            self._write_manifest()
+
+    def register_json(self, filename: str) -> None:
+        """
+        Index a JSON export of the project, e.g. "clicked_laserpoints.json".
+
+        The section is named after the file and records its size and modification time.
+        The file is only read when the section is loaded.
+
+        :param filename: File name relative to the project folder
+        :type filename: str
+        :raises FileNotFoundError: If the file does not exist
+        """
+        stat = os.stat(os.path.join(self.path, filename))
+
+        with _manifest_lock(self.path):
+            self._read_manifest()
+            self._sections[filename] = {
+                "kind": "json",
+                "file": filename,
+                "offset": 0,
+                "size": stat.st_size,
+                "shape": None,
+                "dtype": None,
+                "checksum": None,
+                "attributes": {"mtime_ns": stat.st_mtime_ns},
+            }
+            self._loaded.pop(filename, None)
+            self._write_manifest()
+
+    def json_size(self, filename: str) -> int:
+        """
+        Return the size of a JSON export as indexed by the manifest.
+
+        Exports that are not indexed yet, or that changed since, are indexed first.
+        New projects contain empty exports, such that a size of 0 means that there is no data yet.
+
+        :param filename: File name relative to the project folder
+        :type filename: str
+        :return: Size of the file in bytes, 0 if it does not exist
+        :rtype: int
+        """
+        self._refresh()
+        self._sync_json(filename)
+        return self._sections[filename]["size"] if filename in self._sections else 0
+
+    def remove(self, name: str) -> None:
+        """
+        Remove a section from the manifest.
+
+        :param name: Name of the section
+        :type name: str
+        """
+        with _manifest_lock(self.path):
+            self._read_manifest()
+            self._sections.pop(name)
+            self._loaded.pop(name, None)
+            self._write_manifest()
+
+    def _sync_json(self, filename: str) -> None:
+        try:
+            stat = os.stat(os.path.join(self.path, filename))
+        except FileNotFoundError:
+            # Another instance may have removed the entry already.
+            if filename in self._sections:
+                with contextlib.suppress(KeyError):
+                    self.remove(filename)
+            return
+
+        section = self._sections.get(filename)
+        if (
+            section is None
+            or section["size"] != stat.st_size
+            or section["attributes"]["mtime_ns"] != stat.st_mtime_ns
+        ):
+            self.register_json(filename)
+
+    def _sections_file(self, generation: int) -> str:
+        return f"{PROJECT_SECTIONS_PREFIX}.{generation}.sections"
+
+    def _stat_manifest(self) -> Tuple[int, int, int]:
+        try:
+            stat = os.stat(self._manifest_path)
+        except FileNotFoundError:
+            return None
+
+        # The manifest is replaced atomically, so a new inode marks a new version.
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self) -> None:
+        if self._stat_manifest() != self._manifest_stat:
+            self._read_manifest()
+
+    def _read_manifest(self) -> None:
+        manifest_stat = self._stat_manifest()
+        if manifest_stat is None:
+            sections, generation = {}, 0
+        else:
+            with open(self._manifest_path) as f:
+                manifest = json.load(f)
+
+            if manifest["version"] != PROJECT_MANIFEST_VERSION:
+                raise ValueError(
+                    f"Unsupported manifest version {manifest['version']} in {self.path}."
+                )
+
+            sections, generation = manifest["sections"], manifest["generation"]
+
+        # Keep the memory maps of sections that did not change.
+        self._loaded = {
+            name: value
+            for name, value in self._loaded.items()
+            if sections.get(name) == self._sections.get(name)
+        }
+        self._sections = sections
+        self._generation = generation
+        self._manifest_stat = manifest_stat
+
+    def _write_manifest(self) -> None:
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "version": PROJECT_MANIFEST_VERSION,
+                    "generation": self._generation,
+                    "sections": self._sections,
+                },
+                f,
+                indent=4,
+            )
+        os.replace(tmp_path, self._manifest_path)
+        self._manifest_stat = self._stat_manifest()
+
+    def _compact_if_needed(self) -> None:
+        sections_file = self._sections_file(self._generation)
+        sections_path = os.path.join(self.path, sections_file)
+        stored = [
+            section
+            for section in self._sections.values()
+            if section["file"] == sections_file
+        ]
+        used = sum(section["size"] for section in stored)
+
+        if os.path.getsize(sections_path) <= 2 * used + _SECTION_ALIGNMENT:
+            return
+
+        # Copy the live sections into the next sections file.
+        # The manifest switches to it atomically.
+        new_file = self._sections_file(self._generation + 1)
+        with open(sections_path, "rb") as src, open(
+            os.path.join(self.path, new_file), "wb"
+        ) as dst:
+            for section in sorted(stored, key=lambda s: s["offset"]):
+                dst.write(b"\x00" * (-dst.tell() % _SECTION_ALIGNMENT))
+                src.seek(section["offset"])
+                section["offset"] = dst.tell()
+                section["file"] = new_file
+                dst.write(src.read(section["size"]))
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        self._generation += 1
+        self._write_manifest()
+        self._loaded.clear()
+        self._remove_retired_sections_files()
+
+    def _remove_retired_sections_files(self) -> None:
+        # Other instances may still map the previous generation, or may have read the
+        # manifest just before it switched. It is therefore kept until the next compaction.
+        # Older generations are removed, unless they are still mapped on Windows.
+        pattern = re.compile(rf"{re.escape(PROJECT_SECTIONS_PREFIX)}\.(\d+)\.sections")
+        for filename in os.listdir(self.path):
+            match = pattern.fullmatch(filename)
+            if match and int(match.group(1)) < self._generation - 1:
+                try:
+                    os.remove(os.path.join(self.path, filename))
+                except OSError:
+                    pass
@@ -0,0 +1,143 @@
+import os
+from typing import Iterable, Tuple
+
+import numpy as np
+
+import VFLabel.io.data as data
+import VFLabel.io.project as project
+
+# Binary segmentations are stored as a single bit-packed volume per segmentation type,
+# i.e. a uint8 section of shape FRAMES x HEIGHT x ceil(WIDTH / 8) in the project manifest.
+# This replaces one 8-bit PNG per frame inside the <name>_segmentation folders.
+SEGMENTATION_NAMES = ["glottis", "vocalfold"]
+
+
+def _section_name(name: str) -> str:
+    return f"{name}_segmentation"
+
+
+def write_segmentation_masks(
+    project_container: project.Project, name: str, masks: Iterable[np.array]
+) -> None:
+    """
+    Store binary segmentations of a video as a bit-packed volume.
+
+    Every pixel that is larger than zero in any channel counts as foreground.
+    Without any mask, an empty volume of shape 0 x 0 x 0 and width 0 is stored,
+    unless the size is known from an empty array.
+
+    :param project_container: Project the segmentations are stored in
+    :type project_container: project.Project
+    :param name: One of :data:`SEGMENTATION_NAMES`
+    :type name: str
+    :param masks: Segmentations of shape FRAMES x HEIGHT x WIDTH (x CHANNELS), e.g. a list of images
+    :type masks: Iterable[np.array]
+    """
+    if isinstance(masks, np.ndarray):
+        foreground = masks > 0
+        if foreground.ndim == 4:
+            foreground = foreground.any(axis=-1)
+        packed = np.packbits(foreground, axis=-1)
+        width = foreground.shape[-1]
+    else:
+        # Pack frame by frame, such that no unpacked copy of the whole video is needed.
+        packed_frames = []
+        width = 0
+        for mask in masks:
+            foreground = np.asarray(mask) > 0
+            if foreground.ndim == 3:
+                foreground = foreground.any(axis=-1)
+            packed_frames.append(np.packbits(foreground, axis=-1))
+            width = foreground.shape[-1]
+
+        if packed_frames:
+            packed = np.stack(packed_frames)
+        else:
+            packed = np.zeros([0, 0, 0], dtype=np.uint8)
+
+    project_container.write_array(
+        _section_name(name), packed, attributes={"width": width}
+    )
+
+
+def has_segmentation_masks(project_container: project.Project, name: str) -> bool:
+    """
+    Check whether a project contains bit-packed segmentations of the given name.
+
+    :param project_container: Project to check
+    :type project_container: project.Project
+    :param name: One of :data:`SEGMENTATION_NAMES`
+    :type name: str
+    :return: True if the segmentations are stored in the project
+    :rtype: bool
+    """
+    return _section_name(name) in project_container
+
+
+def read_segmentation_masks(project_container: project.Project, name: str) -> np.array:
+    """
+    Read segmentations that were stored with :func:`write_segmentation_masks`.
+
+    :param project_container: Project the segmentations are stored in
+    :type project_container: project.Project
+    :param name: One of :data:`SEGMENTATION_NAMES`
+    :type name: str
+    :return: Masks of shape FRAMES x HEIGHT x WIDTH, 255 for foreground and 0 for background
+    :rtype: np.array
+    """
+    packed = project_container[_section_name(name)]
+    width = project_container.info(_section_name(name))["attributes"]["width"]
+
+    return np.unpackbits(packed, axis=-1, count=width) * np.uint8(255)
+
+
+def read_project_packed_segmentations(
+    project_path: str, name: str
+) -> Tuple[np.array, int]:
+    """
+    Read the segmentations of a project without unpacking them.
+
+    The bit-packed volume is returned memory mapped, such that only the pages that are
+    indexed later on are read. Projects that were saved before segmentations were bit-packed
+    fall back to the images of their segmentation folder, which are not packed.
+
+    :param project_path: Path to the project folder
+    :type project_path: str
+    :param name: One of :data:`SEGMENTATION_NAMES`
+    :type name: str
+    :return: Masks of shape FRAMES x HEIGHT x ceil(WIDTH / 8) and their width, or unpacked masks and None
+    :rtype: Tuple[np.array, int]
+    """
+    project_container = project.Project(project_path)
+    if has_segmentation_masks(project_container, name):
+        return (
+            project_container[_section_name(name)],
+            project_container.info(_section_name(name))["attributes"]["width"],
+        )
+
+    return read_project_segmentations(project_path, name), None
+
+
+def read_project_segmentations(project_path: str, name: str) -> np.array:
+    """
+    Read the segmentations of a project.
+
+    Projects that were saved before segmentations were bit-packed
+    contain a folder with one image per frame instead, which is read as a fallback.
+
+    :param project_path: Path to the project folder
+    :type project_path: str
+    :param name: One of :data:`SEGMENTATION_NAMES`
+    :type name: str
+    :return: Masks of shape FRAMES x HEIGHT x WIDTH, 255 for foreground and 0 for background, empty if the project has none
+    :rtype: np.array
+    """
+    project_container = project.Project(project_path)
+    if has_segmentation_masks(project_container, name):
+        return read_segmentation_masks(project_container, name)
+
+    folder = os.path.join(project_path, _section_name(name))
+    if not os.path.isdir(folder):
+        return np.empty([0, 0, 0], dtype=np.uint8)
+
+    return data.read_images_from_folder(folder, is_gray=True)
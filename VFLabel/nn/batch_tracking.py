@@ -0,0 +1,151 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+import VFLabel.io as io
+import VFLabel.nn.tracking_cache as tracking_cache
+
+
+def _prepare_project(project_path: str) -> None:
+    # Writes the frame store of projects that only contain the video file.
+    # Nothing is returned, the tracking process memory maps the frame store afterwards.
+    io.read_project_video(project_path)
+
+
+def _write_tracking_json(project_path: str, points: np.array, labels: np.array) -> None:
+    io.point_tracks_to_json(
+        os.path.join(project_path, "predicted_laserpoints.json"),
+        os.path.join(project_path, "label_cycles.json"),
+        points,
+        labels,
+    )
+
+
+def track_project(
+    project_path: str, device: str = "cuda", **tracking_arguments: Any
+) -> Tuple[np.array, np.array]:
+    """
+    Track the clicked laserpoints of a project, like "Track Points" of the point labeling view.
+
+    The tracks are stored in the project, the JSON files are left to the caller.
+
+    :param project_path: Path to the project folder
+    :type project_path: str
+    :param device: Device the model runs on
+    :type device: str
+    :param tracking_arguments: Keyword arguments passed on to :func:`VFLabel.nn.point_tracking.track_points_windowed`
+    :return: Points of shape FRAMES x GRID_HEIGHT x GRID_WIDTH x 2 and labels of shape FRAMES x GRID_HEIGHT x GRID_WIDTH
+    :rtype: Tuple[np.array, np.array]
+    """
+    project_container = io.Project(project_path)
+    video = io.read_project_video(project_path)
+
+    with open(os.path.join(project_path, "progress_status.json")) as f:
+        progress_status = json.load(f)
+    grid_width = int(progress_status["grid_x"])
+    grid_height = int(progress_status["grid_y"])
+
+    points, ids = io.point_dict_to_cotracker(
+        io.dict_from_json(os.path.join(project_path, "clicked_laserpoints.json"))
+    )
+
+    # Only track inside a region around the clicked points and the vocal folds,
+    # the same region the point labeling view uses for this project.
+    segmentations, segmentations_width = io.read_project_packed_segmentations(
+        project_path, "vocalfold"
+    )
+    roi = tracking_cache.project_tracking_roi(
+        project_container,
+        points[:, 1:],
+        video.shape[1:3],
+        segmentations=segmentations,
+        segmentations_width=segmentations_width,
+    )
+
+    grid_points, grid_labels, key = tracking_cache.track_points_cached(
+        project_container,
+        video,
+        points,
+        ids[:, 1:],
+        (grid_height, grid_width),
+        device=device,
+        roi=roi,
+        **tracking_arguments,
+    )
+
+    io.write_point_tracks(project_container, "predicted", grid_points, grid_labels)
+    io.write_point_track_queries(
+        project_container, "predicted", points, ids[:, 1:], key=key
+    )
+
+    return grid_points, grid_labels
+
+
+def track_projects(
+    project_paths: List[str],
+    device: str = "cuda",
+    **tracking_arguments: Any,
+) -> Dict[str, str]:
+    """
+    Track the clicked laserpoints of many projects without the GUI.
+
+    The model is loaded once and runs in this process.
+    A worker process prepares the frame store of the next project while the current one is tracked,
+    and a thread writes the predicted_laserpoints.json and label_cycles.json files of finished projects.
+    A project that fails is skipped and its error is returned.
+
+    :param project_paths: Paths to the project folders
+    :type project_paths: List[str]
+    :param device: Device the model runs on
+    :type device: str
+    :param tracking_arguments: Keyword arguments passed on to :func:`VFLabel.nn.point_tracking.track_points_windowed`
+    :return: Error message of every project that failed, by project path
+    :rtype: Dict[str, str]
+    """
+    errors = {}
+    written: List[Tuple[str, Future]] = []
+
+    # The worker is spawned, since this process holds the model and possibly a CUDA context.
+    with ProcessPoolExecutor(
+        1, mp_context=multiprocessing.get_context("spawn")
+    ) as preparer, ThreadPoolExecutor(1) as writer:
+        preparation = (
+            preparer.submit(_prepare_project, project_paths[0])
+            if project_paths
+            else None
+        )
+
+        for index, project_path in enumerate(project_paths):
+            current_preparation = preparation
+            if index + 1 < len(project_paths):
+                preparation = preparer.submit(
+                    _prepare_project, project_paths[index + 1]
+                )
+
+            try:
+                current_preparation.result()
+                points, labels = track_project(
+                    project_path, device, **tracking_arguments
+                )
+            except Exception as e:
+                errors[project_path] = f"{type(e).__name__}: {e}"
+                continue
+
+            written.append(
+                (
+                    project_path,
+                    writer.submit(_write_tracking_json, project_path, points, labels),
+                )
+            )
+
+        for project_path, future in written:
+            try:
+                future.result()
+            except Exception as e:
+                errors[project_path] = f"{type(e).__name__}: {e}"
+
+    return errors
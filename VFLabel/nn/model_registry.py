@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import torch
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models, keyed by checkpoint path and device.
+
+    Loading a checkpoint and moving it to a device is expensive,
+    so every model is loaded once and then reused by all callers until it is evicted.
+    The registry is thread-safe, such that background workers can share it with the GUI.
+
+    :param load_fn: Loads a model from a checkpoint path, the registry moves it to the device afterwards
+    :type load_fn: Callable[[str], torch.nn.Module]
+    """
+
+    def __init__(self, load_fn: Callable[[str], torch.nn.Module]):
+        self._load_fn = load_fn
+        self._models: Dict[Tuple[str, str], torch.nn.Module] = {}
+        self._load_times: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(checkpoint: str, device: str) -> Tuple[str, str]:
+        return os.path.abspath(checkpoint), str(torch.device(device))
+
+    def get(self, checkpoint: str, device: str = "cuda") -> torch.nn.Module:
+        """
+        Return the model of a checkpoint on a device, loading it on first use.
+
+        :param checkpoint: Path to the checkpoint
+        :type checkpoint: str
+        :param device: Device the model runs on
+        :type device: str
+        :return: The loaded model
+        :rtype: torch.nn.Module
+        """
+        key = self._key(checkpoint, device)
+
+        with self._lock:
+            if key not in self._models:
+                start = time.perf_counter()
+                model = self._load_fn(checkpoint)
+                model.to(device)
+                self._models[key] = model
+                self._load_times[key] = time.perf_counter() - start
+
+            return self._models[key]
+
+    def load_time(self, checkpoint: str, device: str = "cuda") -> Optional[float]:
+        """
+        Return how long loading a model took.
+
+        :param checkpoint: Path to the checkpoint
+        :type checkpoint: str
+        :param device: Device the model runs on
+        :type device: str
+        :return: Load time in seconds, None if the model is not loaded
+        :rtype: Optional[float]
+        """
+        return self._load_times.get(self._key(checkpoint, device))
+
+    def loaded(self) -> List[Tuple[str, str]]:
+        """
+        Return the checkpoint paths and devices of all loaded models.
+
+        :return: List of (checkpoint, device) tuples
+        :rtype: List[Tuple[str, str]]
+        """
+        with self._lock:
+            return list(self._models.keys())
+
+    def evict(self, checkpoint: str = None, device: str = None) -> int:
+        """
+        Remove models from the registry to free their memory.
+
+        :param checkpoint: Only evict models of this checkpoint, all if None
+        :type checkpoint: str
+        :param device: Only evict models on this device, all if None
+        :type device: str
+        :return: Number of evicted models
+        :rtype: int
+        """
+        with self._lock:
+            keys = [
+                key
+                for key in self._models
+                if (checkpoint is None or key[0] == os.path.abspath(checkpoint))
+                and (device is None or key[1] == str(torch.device(device)))
+            ]
+
+            for key in keys:
+                del self._models[key]
+                del self._load_times[key]
+
+        if keys and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+        return len(keys)
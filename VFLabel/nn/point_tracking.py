@@ -1,59 +1,246 @@
 import os
-from typing import List
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
 
 import numpy as np
 import torch
 from cotracker.predictor import CoTrackerPredictor
 
+import VFLabel.nn.model_registry
+from VFLabel.nn.window_aggregation import WindowAggregator, window_weights
 
-def track_points_windowed(
+COTRACKER_CHECKPOINT: str = os.path.join("assets", "models", "scaled_offline.pth")
+
+# Loaded CoTracker models are shared by all tracking calls of the process.
+COTRACKER_MODELS = VFLabel.nn.model_registry.ModelRegistry(
+    lambda checkpoint: CoTrackerPredictor(checkpoint=checkpoint)
+)
+
+
+class TrackingCancelled(Exception):
+    """
+    Raised when tracking is stopped through its stop event.
+    """
+
+
+def get_cotracker_model(
+    checkpoint: str = COTRACKER_CHECKPOINT, device="cuda"
+) -> CoTrackerPredictor:
+    return COTRACKER_MODELS.get(checkpoint, device)
+
+
+# How the query points of a window are chosen:
+#   sequential: from the frame with the most visible points of the previous window.
+#               Every window depends on the previous one, so windows run one after another.
+#   clicked:    the clicked points are reused at the first frame of every window.
+#               Laser points only move a few pixels, so all windows are independent and run batched.
+#   first_pass: from a fast sequential pass over every first_pass_step-th frame,
+#               after which all windows are independent and run batched.
+REQUERY_MODES: List[str] = ["sequential", "clicked", "first_pass"]
+
+
+def prepare_video(
     video: np.array,
-    query_points: np.array,
-    window_size: int = 50,
-    stride: int = 25,
     device="cuda",
-) -> np.array:
-    video = torch.from_numpy(video).to(device)
-    query_points = torch.from_numpy(query_points).float().to(device)
+    dtype: torch.dtype = torch.uint8,
+    scale: float = 1.0,
+    grayscale: bool = False,
+    roi: Tuple[int, int, int, int] = None,
+    chunk_size: int = 64,
+) -> torch.tensor:
+    """
+    Convert a video once into the tensor layout CoTracker consumes.
 
-    # Run Offline CoTracker:
-    model = CoTrackerPredictor(
-        checkpoint=os.path.join("assets/models/scaled_offline.pth")
+    The tensor is preallocated on the device and filled chunk by chunk,
+    such that no full-size float32 copy of the video ever exists.
+    uint8 tensors are converted to float32 per window, floating point tensors are used as is.
+    Grayscale videos only keep a single channel, which is expanded to three channels
+    without copying when a window is passed to the model.
+
+    :param video: Video of shape FRAMES x HEIGHT x WIDTH x CHANNELS
+    :type video: np.array
+    :param device: Device the tensor is stored on
+    :type device: str
+    :param dtype: Type of the tensor, torch.bfloat16 or torch.float16 additionally run the model in that precision
+    :type dtype: torch.dtype
+    :param scale: Spatial scale factor, e.g. 0.5 to halve width and height
+    :type scale: float
+    :param grayscale: Whether only the first channel is kept
+    :type grayscale: bool
+    :param roi: Optional region of interest (x_min, y_min, x_max, y_max) with exclusive max, which is cropped before scaling
+    :type roi: Tuple[int, int, int, int]
+    :param chunk_size: Number of frames converted at once
+    :type chunk_size: int
+    :return: Tensor of shape FRAMES x CHANNELS x HEIGHT x WIDTH
+    :rtype: torch.tensor
+    """
+    num_frames, height, width = video.shape[:3]
+    x_min, y_min, x_max, y_max = roi if roi is not None else (0, 0, width, height)
+    channels = 1 if grayscale or video.ndim == 3 else video.shape[3]
+    size = (round((y_max - y_min) * scale), round((x_max - x_min) * scale))
+
+    prepared = torch.empty([num_frames, channels, *size], dtype=dtype, device=device)
+    for start in range(0, num_frames, chunk_size):
+        chunk = np.asarray(video[start : start + chunk_size, y_min:y_max, x_min:x_max])
+        chunk = chunk[..., None] if chunk.ndim == 3 else chunk[..., :channels]
+        chunk = torch.from_numpy(np.ascontiguousarray(chunk)).to(device)
+        chunk = chunk.permute(0, 3, 1, 2).float()
+
+        if scale != 1.0:
+            chunk = torch.nn.functional.interpolate(
+                chunk, size=size, mode="bilinear", align_corners=False, antialias=True
+            )
+
+        if not dtype.is_floating_point:
+            chunk = chunk.round().clamp(0, 255)
+
+        prepared[start : start + len(chunk)] = chunk
+
+    return prepared
+
+
+def _foreground_rows_and_columns(
+    segmentations: np.array, width: int = None, chunk_size: int = 256
+) -> Tuple[np.array, np.array]:
+    # OR the masks over all frames, a chunk of frames at a time.
+    # Packed masks are reduced bytewise, which ORs their bits without unpacking them.
+    union = np.zeros(segmentations.shape[1:3], dtype=np.uint8)
+    for start in range(0, len(segmentations), chunk_size):
+        chunk = segmentations[start : start + chunk_size]
+        if width is None:
+            union |= (chunk > 0).any(axis=0)
+        else:
+            union |= np.bitwise_or.reduce(chunk, axis=0)
+
+    rows = np.flatnonzero(union.any(axis=1))
+    columns = np.bitwise_or.reduce(union, axis=0)
+    if width is not None:
+        columns = np.unpackbits(columns, count=width)
+
+    return rows, np.flatnonzero(columns)
+
+
+def tracking_roi(
+    points: np.array,
+    frame_size: Tuple[int, int],
+    padding: int = 32,
+    segmentations: np.array = None,
+    segmentations_width: int = None,
+) -> Tuple[int, int, int, int]:
+    """
+    Compute the region of interest that tracking can be restricted to.
+
+    The region is the bounding box of the points, optionally unioned with
+    the bounding box of the segmentations over all frames, grown by padding and clipped to the frame.
+    Segmentations are reduced chunk by chunk, such that they may be memory mapped and bit-packed.
+
+    :param points: Points of shape NUM_POINTS x 2 as [x, y], e.g. the clicked laserpoints
+    :type points: np.array
+    :param frame_size: Height and width of the frames
+    :type frame_size: Tuple[int, int]
+    :param padding: Number of pixels added on every side
+    :type padding: int
+    :param segmentations: Optional masks of shape FRAMES x HEIGHT x WIDTH, e.g. the vocal fold segmentation,
+        or FRAMES x HEIGHT x ceil(WIDTH / 8) if they are bit-packed
+    :type segmentations: np.array
+    :param segmentations_width: Width of the segmentations if they are bit-packed along the last axis
+    :type segmentations_width: int
+    :return: Region of interest as (x_min, y_min, x_max, y_max), max exclusive
+    :rtype: Tuple[int, int, int, int]
+    """
+    height, width = frame_size
+    points = np.asarray(points, dtype=float)
+    points = points[~np.isnan(points).any(axis=-1)]
+
+    x_min, y_min = np.floor(points.min(axis=0)) if len(points) else (width, height)
+    x_max, y_max = np.ceil(points.max(axis=0)) + 1 if len(points) else (0, 0)
+
+    if segmentations is not None and len(segmentations):
+        rows, columns = _foreground_rows_and_columns(segmentations, segmentations_width)
+        if len(rows):
+            x_min, x_max = min(x_min, columns[0]), max(x_max, columns[-1] + 1)
+            y_min, y_max = min(y_min, rows[0]), max(y_max, rows[-1] + 1)
+
+    if x_min >= x_max or y_min >= y_max:
+        return 0, 0, width, height
+
+    return (
+        int(max(x_min - padding, 0)),
+        int(max(y_min - padding, 0)),
+        int(min(x_max + padding, width)),
+        int(min(y_max + padding, height)),
     )
-    model.to(device)
 
-    num_query_points: int = query_points.shape[0]
-    video_length: int = video.shape[0]
 
-    final_points = np.zeros([video_length, num_query_points, 2], dtype=float)
-    final_visibility = np.zeros([video_length, num_query_points], dtype=np.uint8)
-    counts = np.zeros([video_length, num_query_points, 2], dtype=np.float32)
-    iterations = video_length // stride
+def _to_tracking_coordinates(
+    points: torch.tensor, offset: Tuple[int, int], scale: float
+) -> torch.tensor:
+    # Maps frame coordinates into the cropped and resized video, pixel centers stay aligned.
+    return (points - points.new_tensor(offset) + 0.5) * scale - 0.5
 
-    for i in range(iterations):
 
-        # Calculate the start and end indices for the current chunk
-        start_idx = i * stride
-        end_idx = min(start_idx + window_size, video_length)
+def _from_tracking_coordinates(
+    points: np.array, offset: Tuple[int, int], scale: float
+) -> np.array:
+    return (points + 0.5) / scale - 0.5 + np.asarray(offset)
+
+
+def _run_model(
+    model: CoTrackerPredictor, video: torch.tensor, queries: torch.tensor
+) -> Tuple[torch.tensor, torch.tensor]:
+    # video is B T C H W as returned by prepare_video, queries B N 3.
+    if video.shape[2] == 1:
+        video = video.expand(-1, -1, 3, -1, -1)
 
-        video_tensor = video[start_idx:end_idx]
-        video_tensor = (
-            video_tensor.permute(0, 3, 1, 2)[None].float().to(device)
-        )  # B T C H W
+    if not video.is_floating_point():
+        video = video.float()
+
+    with torch.autocast(
+        device_type=video.device.type,
+        dtype=video.dtype,
+        enabled=video.dtype in [torch.bfloat16, torch.float16],
+    ):
         pred_tracks, pred_visibility = model(
-            video_tensor,
-            queries=query_points[None],
+            video,
+            queries=queries,
             backward_tracking=True,
         )
 
-        # Add the values to the final tensor and update the counts
-        final_points[start_idx:end_idx] += pred_tracks.squeeze(0).detach().cpu().numpy()
-        final_visibility[start_idx:end_idx] += (
-            pred_visibility.squeeze(0).detach().cpu().numpy()
+    return pred_tracks.float(), pred_visibility
+
+
+def _window_bounds(
+    video_length: int, window_size: int, stride: int
+) -> List[Tuple[int, int]]:
+    iterations = max(video_length // stride, 1)
+    return [
+        (i * stride, min(i * stride + window_size, video_length))
+        for i in range(iterations)
+    ]
+
+
+def _track_windows_sequential(
+    model: CoTrackerPredictor,
+    video: torch.tensor,
+    query_points: torch.tensor,
+    window_size: int,
+    stride: int,
+) -> Iterator[Tuple[int, int, np.array, np.array]]:
+    windows = _window_bounds(video.shape[0], window_size, stride)
+
+    for i, (start_idx, end_idx) in enumerate(windows):
+        pred_tracks, pred_visibility = _run_model(
+            model, video[start_idx:end_idx][None], query_points[None]
+        )
+
+        yield (
+            start_idx,
+            end_idx,
+            pred_tracks.squeeze(0).detach().cpu().numpy(),
+            pred_visibility.squeeze(0).detach().cpu().numpy(),
         )
-        counts[start_idx:end_idx] += 1
 
-        if i < iterations - 1:
+        if i < len(windows) - 1:
             # Find suitable query points from second half of window size
             frame_with_most_good_points = (
                 pred_visibility[:, stride:window_size].sum(dim=-1).argmax()
@@ -65,23 +252,484 @@ def track_points_windowed(
             ]
             query_points = new_query_points
 
-    # Average the overlapping regions
-    final_points /= counts
-    final_visibility = (final_visibility / counts[:, :, 0] > 0.5) * 1.0
 
-    return final_points, final_visibility
+def _track_windows_batched(
+    model: CoTrackerPredictor,
+    video: torch.tensor,
+    windows: List[Tuple[int, int, torch.tensor]],
+    batch_size: int,
+) -> Iterator[Tuple[int, int, np.array, np.array]]:
+    # Windows of equal length are stacked along the batch dimension.
+    windows_by_length: Dict[int, List[Tuple[int, int, torch.tensor]]] = {}
+    for window in windows:
+        windows_by_length.setdefault(window[1] - window[0], []).append(window)
+
+    for same_length_windows in windows_by_length.values():
+        for batch_start in range(0, len(same_length_windows), batch_size):
+            batch = same_length_windows[batch_start : batch_start + batch_size]
+
+            pred_tracks, pred_visibility = _run_model(
+                model,
+                torch.stack(
+                    [video[start_idx:end_idx] for start_idx, end_idx, _ in batch]
+                ),
+                torch.stack([queries for _, _, queries in batch]),
+            )
+
+            pred_tracks = pred_tracks.detach().cpu().numpy()
+            pred_visibility = pred_visibility.detach().cpu().numpy()
+            for i, (start_idx, end_idx, _) in enumerate(batch):
+                yield start_idx, end_idx, pred_tracks[i], pred_visibility[i]
+
+
+def _clicked_window_queries(
+    query_points: torch.tensor, windows: List[Tuple[int, int]]
+) -> List[Tuple[int, int, torch.tensor]]:
+    window_queries = []
+    for start_idx, end_idx in windows:
+        queries = query_points.clone()
+        if start_idx > 0:
+            queries[:, 0] = 0
+        window_queries.append((start_idx, end_idx, queries))
+
+    return window_queries
+
+
+def _first_pass_window_queries(
+    model: CoTrackerPredictor,
+    video: torch.tensor,
+    query_points: torch.tensor,
+    windows: List[Tuple[int, int]],
+    window_size: int,
+    stride: int,
+    first_pass_step: int,
+) -> List[Tuple[int, int, torch.tensor]]:
+    # Track every first_pass_step-th frame only. Query frames are snapped to that grid.
+    coarse_queries = query_points.clone()
+    coarse_queries[:, 0] = torch.div(
+        coarse_queries[:, 0], first_pass_step, rounding_mode="floor"
+    )
+    coarse_video = video[::first_pass_step]
+    coarse_points, coarse_visibility = _merge_windows(
+        _track_windows_sequential(
+            model, coarse_video, coarse_queries, window_size, stride
+        ),
+        coarse_video.shape[0],
+        query_points.shape[0],
+    )
+
+    window_queries = []
+    for start_idx, end_idx in windows:
+        if start_idx == 0:
+            window_queries.append((start_idx, end_idx, query_points))
+            continue
+
+        # Query from the coarse frame inside the window with the most visible points.
+        coarse_frames = np.arange(
+            -(-start_idx // first_pass_step),
+            min(-(-end_idx // first_pass_step), coarse_video.shape[0]),
+        )
+        if len(coarse_frames) == 0:
+            # The window is shorter than the coarse step, use the closest coarse frame before it.
+            coarse_frames = np.array([start_idx // first_pass_step])
+
+        coarse_frame = coarse_frames[
+            coarse_visibility[coarse_frames].sum(axis=-1).argmax()
+        ]
+
+        queries = torch.zeros_like(query_points)
+        queries[:, 0] = float(max(coarse_frame * first_pass_step - start_idx, 0))
+        queries[:, 1:3] = torch.from_numpy(coarse_points[coarse_frame]).to(queries)
+        window_queries.append((start_idx, end_idx, queries))
+
+    return window_queries
+
+
+def _report_windows(
+    windows: Iterator[Tuple[int, int, np.array, np.array]],
+    num_windows: int,
+    progress_callback: Callable[[int, int], None] = None,
+    stop_event: threading.Event = None,
+) -> Iterator[Tuple[int, int, np.array, np.array]]:
+    # Windows are tracked lazily, checking the stop event here prevents the next window from being tracked.
+    if stop_event is not None and stop_event.is_set():
+        raise TrackingCancelled()
+
+    for num_tracked, window in enumerate(windows, 1):
+        yield window
+
+        if progress_callback:
+            progress_callback(num_tracked, num_windows)
+
+        if stop_event is not None and stop_event.is_set():
+            raise TrackingCancelled()
+
+
+def _merge_windows(
+    windows: Iterable[Tuple[int, int, np.array, np.array]],
+    video_length: int,
+    num_query_points: int,
+    weighting: str = "uniform",
+) -> Tuple[np.array, np.array]:
+    aggregator = WindowAggregator(video_length, num_query_points, weighting)
+
+    # Reduce every window as soon as it is tracked, such that no window is kept around.
+    for start_idx, end_idx, pred_tracks, pred_visibility in windows:
+        aggregator.add(start_idx, end_idx, pred_tracks, pred_visibility)
+
+    return aggregator.result()
+
+
+def track_points_windowed(
+    video: np.array,
+    query_points: np.array,
+    window_size: int = 50,
+    stride: int = 25,
+    device="cuda",
+    checkpoint: str = COTRACKER_CHECKPOINT,
+    requery: str = "sequential",
+    batch_size: int = 4,
+    num_threads: int = None,
+    first_pass_step: int = 5,
+    dtype: torch.dtype = torch.uint8,
+    scale: float = 1.0,
+    grayscale: bool = False,
+    roi: Tuple[int, int, int, int] = None,
+    weighting: str = "uniform",
+    progress_callback: Callable[[int, int], None] = None,
+    stop_event: threading.Event = None,
+) -> Tuple[np.array, np.array]:
+    """
+    Track points through a video with CoTracker in overlapping windows.
+
+    Windows of window_size frames start stride frames apart,
+    and the predictions of overlapping windows are blended, see :class:`VFLabel.nn.window_aggregation.WindowAggregator`.
+    The video is converted once by :func:`prepare_video`, optionally cropped, scaled and reduced to grayscale.
+    Points are returned in the coordinates of the original frames.
+
+    :param video: Video of shape FRAMES x HEIGHT x WIDTH x CHANNELS, may be memory mapped
+    :type video: np.array
+    :param query_points: Query points of shape NUM_POINTS x 3 as [frame, x, y]
+    :type query_points: np.array
+    :param window_size: Number of frames per window
+    :type window_size: int
+    :param stride: Number of frames between the starts of consecutive windows
+    :type stride: int
+    :param device: Device the model runs on
+    :type device: str
+    :param checkpoint: Path to the CoTracker checkpoint
+    :type checkpoint: str
+    :param requery: How the query points of a window are chosen, one of :data:`REQUERY_MODES`
+    :type requery: str
+    :param batch_size: Number of windows tracked at once, unless requery is "sequential"
+    :type batch_size: int
+    :param num_threads: Number of CPU threads torch uses during tracking, torch's current setting if None
+    :type num_threads: int
+    :param first_pass_step: Frame step of the coarse pass of the "first_pass" requery mode
+    :type first_pass_step: int
+    :param dtype: Type of the prepared video, see :func:`prepare_video`
+    :type dtype: torch.dtype
+    :param scale: Spatial scale factor of the prepared video
+    :type scale: float
+    :param grayscale: Whether only the first channel of the video is tracked
+    :type grayscale: bool
+    :param roi: Optional region of interest (x_min, y_min, x_max, y_max) with exclusive max, see :func:`tracking_roi`
+    :type roi: Tuple[int, int, int, int]
+    :param weighting: How overlapping windows are blended, one of :data:`VFLabel.nn.window_aggregation.WINDOW_WEIGHTINGS`
+    :type weighting: str
+    :param progress_callback: Called with the number of tracked windows and the total number of windows
+    :type progress_callback: Callable[[int, int], None]
+    :param stop_event: If set, tracking stops after the current window
+    :type stop_event: threading.Event
+    :raises ValueError: If the requery mode is unknown
+    :raises TrackingCancelled: If the stop event was set
+    :return: Points of shape FRAMES x NUM_POINTS x 2 and visibility of shape FRAMES x NUM_POINTS
+    :rtype: Tuple[np.array, np.array]
+    """
+    if requery not in REQUERY_MODES:
+        raise ValueError(f"Unknown requery mode {requery}, expected {REQUERY_MODES}.")
+
+    # The number of threads is a process wide setting, so it is restored afterwards.
+    previous_num_threads = torch.get_num_threads()
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+
+    try:
+        video = prepare_video(video, device, dtype, scale, grayscale, roi)
+        query_points = torch.from_numpy(query_points).float().to(device)
+        offset = roi[:2] if roi is not None else (0, 0)
+        query_points[:, 1:3] = _to_tracking_coordinates(
+            query_points[:, 1:3], offset, scale
+        )
+
+        # Run Offline CoTracker:
+        model = get_cotracker_model(checkpoint, device)
+
+        num_query_points: int = query_points.shape[0]
+        video_length: int = video.shape[0]
+        windows = _window_bounds(video_length, window_size, stride)
+
+        if requery == "sequential":
+            tracked_windows = _track_windows_sequential(
+                model, video, query_points, window_size, stride
+            )
+        else:
+            if requery == "clicked":
+                window_queries = _clicked_window_queries(query_points, windows)
+            else:
+                window_queries = _first_pass_window_queries(
+                    model,
+                    video,
+                    query_points,
+                    windows,
+                    window_size,
+                    stride,
+                    first_pass_step,
+                )
+
+            tracked_windows = _track_windows_batched(
+                model, video, window_queries, batch_size
+            )
+
+        tracked_windows = _report_windows(
+            tracked_windows, len(windows), progress_callback, stop_event
+        )
+        final_points, final_visibility = _merge_windows(
+            tracked_windows, video_length, num_query_points, weighting
+        )
+        final_points = _from_tracking_coordinates(final_points, offset, scale)
+
+        return final_points, final_visibility
+    finally:
+        torch.set_num_threads(previous_num_threads)
+
+
+def track_points_streaming(
+    frames: Iterable[np.array],
+    query_points: np.array,
+    window_size: int = 50,
+    stride: int = 25,
+    device="cuda",
+    checkpoint: str = COTRACKER_CHECKPOINT,
+    weighting: str = "uniform",
+) -> Iterator[Tuple[int, np.array, np.array]]:
+    """
+    Track points through a stream of frames with bounded memory.
+
+    Only the frames of the current window are kept, together with the accumulated
+    predictions of the frames the next window overlaps with.
+    Windows are chained like the sequential mode of :func:`track_points_windowed`.
+    As soon as a frame is not covered by any later window, its averaged prediction is emitted.
+    Memory usage is therefore independent of the length of the video.
+
+    :param frames: Frames of shape HEIGHT x WIDTH x CHANNELS, e.g. a video generator
+    :type frames: Iterable[np.array]
+    :param query_points: Query points of shape NUM_POINTS x 3 as [frame, x, y], the frames have to lie inside the first window
+    :type query_points: np.array
+    :param window_size: Number of frames per window
+    :type window_size: int
+    :param stride: Number of frames between the starts of consecutive windows
+    :type stride: int
+    :param device: Device the model runs on
+    :type device: str
+    :param checkpoint: Path to the CoTracker checkpoint
+    :type checkpoint: str
+    :param weighting: How overlapping windows are blended, one of :data:`VFLabel.nn.window_aggregation.WINDOW_WEIGHTINGS`
+    :type weighting: str
+    :return: Generator yielding the first frame index, points of shape FRAMES x NUM_POINTS x 2 and visibility of shape FRAMES x NUM_POINTS of every finalized segment
+    :rtype: Iterator[Tuple[int, np.array, np.array]]
+    """
+    frames = iter(frames)
+    query_points = torch.from_numpy(query_points).float().to(device)
+    num_query_points: int = query_points.shape[0]
+    overlap = window_size - stride
+
+    model = get_cotracker_model(checkpoint, device)
+
+    window = None
+    num_buffered = 0
+    window_start = 0
+    point_sums = np.zeros([window_size, num_query_points, 2], dtype=float)
+    visibility_sums = np.zeros([window_size, num_query_points], dtype=float)
+    counts = np.zeros([window_size, 1], dtype=float)
+    weights = window_weights(window_size, weighting)[:, None]
+
+    def finalize(num_frames: int) -> Tuple[int, np.array, np.array]:
+        return (
+            window_start,
+            point_sums[:num_frames] / counts[:num_frames, :, None],
+            (visibility_sums[:num_frames] / counts[:num_frames] > 0.5) * 1.0,
+        )
+
+    while True:
+        # Fill the window with the next frames of the stream.
+        num_new_frames = 0
+        for frame in frames:
+            if window is None:
+                window = np.empty([window_size, *frame.shape], dtype=frame.dtype)
+            window[num_buffered] = frame
+            num_buffered += 1
+            num_new_frames += 1
+            if num_buffered == window_size:
+                break
+
+        if num_new_frames == 0:
+            # The stream ended, the overlap is not covered by another window.
+            if num_buffered > 0 and counts[0, 0] > 0:
+                yield finalize(min(num_buffered, overlap))
+            return
+
+        video_tensor = torch.from_numpy(window[:num_buffered]).to(device)
+        video_tensor = video_tensor.permute(0, 3, 1, 2)[None]  # B T C H W
+        pred_tracks, pred_visibility = _run_model(
+            model, video_tensor, query_points[None]
+        )
+
+        if num_buffered < window_size:
+            weights = window_weights(num_buffered, weighting)[:, None]
+
+        point_sums[:num_buffered] += (
+            pred_tracks.squeeze(0).detach().cpu().numpy() * weights[:, :, None]
+        )
+        visibility_sums[:num_buffered] += (
+            pred_visibility.squeeze(0).detach().cpu().numpy() * weights
+        )
+        counts[:num_buffered] += weights
+
+        if num_buffered < window_size:
+            # The stream ended inside this window.
+            yield finalize(num_buffered)
+            return
+
+        # The first stride frames are not covered by any later window.
+        yield finalize(stride)
+
+        # Find suitable query points from second half of window size
+        frame_with_most_good_points = (
+            pred_visibility[:, stride:window_size].sum(dim=-1).argmax()
+        )
+        new_query_points = torch.zeros_like(query_points)
+        new_query_points[:, 0] = frame_with_most_good_points
+        new_query_points[:, 1:3] = pred_tracks[0, stride + frame_with_most_good_points]
+        query_points = new_query_points
+
+        # Keep the overlap with the next window.
+        window[:overlap] = window[stride:].copy()
+        point_sums[:overlap] = point_sums[stride:].copy()
+        visibility_sums[:overlap] = visibility_sums[stride:].copy()
+        counts[:overlap] = counts[stride:].copy()
+        point_sums[overlap:] = 0
+        visibility_sums[overlap:] = 0
+        counts[overlap:] = 0
+        num_buffered = overlap
+        window_start += stride
+
+
+def changed_query_points(
+    previous_query_points: np.array,
+    previous_ids: np.array,
+    query_points: np.array,
+    ids: np.array,
+) -> Tuple[np.array, np.array]:
+    """
+    Compare the query points of a previous tracking run with the current ones.
+
+    :param previous_query_points: Query points of shape NUM_PREVIOUS x 3 as [frame, x, y]
+    :type previous_query_points: np.array
+    :param previous_ids: [x_id, y_id] of shape NUM_PREVIOUS x 2
+    :type previous_ids: np.array
+    :param query_points: Query points of shape NUM_POINTS x 3 as [frame, x, y]
+    :type query_points: np.array
+    :param ids: [x_id, y_id] of shape NUM_POINTS x 2
+    :type ids: np.array
+    :return: Mask of shape NUM_POINTS of changed or added query points and the [x_id, y_id] of removed laserpoints
+    :rtype: Tuple[np.array, np.array]
+    """
+    previous = np.concatenate([previous_query_points, previous_ids], axis=1)
+    current = np.concatenate([query_points, ids], axis=1)
+    previous_rows = {row.tobytes() for row in previous.astype(np.float32)}
+    changed = np.array(
+        [row.tobytes() not in previous_rows for row in current.astype(np.float32)],
+        dtype=bool,
+    )
+
+    current_ids = {tuple(point_id) for point_id in np.asarray(ids, dtype=int)}
+    removed = np.array(
+        [
+            point_id
+            for point_id in np.unique(np.asarray(previous_ids, dtype=int), axis=0)
+            if tuple(point_id) not in current_ids
+        ],
+        dtype=int,
+    ).reshape(-1, 2)
+
+    return changed, removed
+
+
+def retrack_points(
+    video: np.array,
+    points: np.array,
+    visibility: np.array,
+    query_points: np.array,
+    ids: np.array,
+    frame_range: Tuple[int, int] = None,
+    **tracking_arguments,
+) -> Tuple[np.array, np.array]:
+    """
+    Track a subset of laserpoints again and merge their tracks into existing point tracks.
+
+    Only the given query points are tracked, and only over the frame range,
+    such that fixing a single click does not require tracking the whole grid again.
+
+    :param video: Video of shape FRAMES x HEIGHT x WIDTH x CHANNELS
+    :type video: np.array
+    :param points: Existing tracks of shape FRAMES x GRID_HEIGHT x GRID_WIDTH x 2
+    :type points: np.array
+    :param visibility: Existing visibility of shape FRAMES x GRID_HEIGHT x GRID_WIDTH
+    :type visibility: np.array
+    :param query_points: Query points of shape NUM_POINTS x 3 as [frame, x, y], the frames have to lie inside the frame range
+    :type query_points: np.array
+    :param ids: [x_id, y_id] of the laserpoint of every query point, shape NUM_POINTS x 2
+    :type ids: np.array
+    :param frame_range: First frame and frame after the last frame that are tracked, the whole video if None
+    :type frame_range: Tuple[int, int]
+    :param tracking_arguments: Keyword arguments passed on to :func:`track_points_windowed`
+    :raises ValueError: If a query point lies outside of the frame range
+    :return: Merged copies of the points and the visibility
+    :rtype: Tuple[np.array, np.array]
+    """
+    points = np.array(points, dtype=float)
+    visibility = np.array(visibility, dtype=float)
+    if len(query_points) == 0:
+        return points, visibility
+
+    start, end = frame_range if frame_range is not None else (0, len(video))
+    query_points = np.array(query_points, dtype=float)
+    if ((query_points[:, 0] < start) | (query_points[:, 0] >= end)).any():
+        raise ValueError(f"Query points have to lie inside frames {start} to {end}.")
+    query_points[:, 0] -= start
+
+    tracked_points, tracked_visibility = track_points_windowed(
+        video[start:end], query_points, **tracking_arguments
+    )
+
+    ids = np.asarray(ids, dtype=int)
+    points[start:end, ids[:, 1], ids[:, 0]] = tracked_points
+    visibility[start:end, ids[:, 1], ids[:, 0]] = tracked_visibility
+
+    return points, visibility
 
 
 def track_points(
-    video: torch.tensor, query_points: np.array, device="cuda"
+    video: torch.tensor,
+    query_points: np.array,
+    device="cuda",
+    checkpoint: str = COTRACKER_CHECKPOINT,
 ) -> np.array:
     query_points = torch.from_numpy(query_points).float().to(device)
 
     # Run Offline CoTracker:
-    model = CoTrackerPredictor(
-        checkpoint=os.path.join("assets/models/scaled_offline.pth")
-    )
-    model.to(device)
+    model = get_cotracker_model(checkpoint, device)
 
     pred_tracks, pred_visibility = model(
         video,
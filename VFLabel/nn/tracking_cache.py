@@ -0,0 +1,245 @@
+import hashlib
+import os
+from typing import Any, Tuple
+
+import numpy as np
+
+import VFLabel.io.data as data
+import VFLabel.io.point_tracks as point_tracks
+import VFLabel.io.project as project
+import VFLabel.nn.point_tracking as point_tracking
+
+# Tracking results are cached in the point tracks of the project, see VFLabel.io.point_tracks.
+# The query points the tracks were computed from are stored next to them, together with a key
+# that hashes everything the tracks depend on except the query points themselves, i.e. the
+# video, the tracking parameters and the checkpoint. If the key still matches,
+# only laserpoints whose query points changed are tracked again.
+#
+# The region of interest is one of the tracking parameters. It is therefore computed once
+# per project and stored as a section, instead of following the bounding box of the clicks.
+#
+# Note that reusing single queries is an approximation. CoTracker attends over all queries
+# of a window jointly, so a point that is tracked alone or with a different set of points
+# may end up slightly different than the same point tracked together with all others.
+# Only tracking all queries again reproduces the tracks exactly.
+TRACKING_ROI_NAME: str = "tracking_roi"
+
+# Arguments of track_points_windowed that do not change its result.
+_UNKEYED_ARGUMENTS = [
+    "device",
+    "batch_size",
+    "num_threads",
+    "progress_callback",
+    "stop_event",
+]
+
+
+def video_digest(video: np.array, chunk_size: int = 64) -> str:
+    """
+    Hash the shape, dtype and pixels of a video.
+
+    :param video: Video of shape FRAMES x HEIGHT x WIDTH x CHANNELS, may be memory mapped
+    :type video: np.array
+    :param chunk_size: Number of frames hashed at once
+    :type chunk_size: int
+    :return: Hex digest of the video
+    :rtype: str
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(repr((tuple(video.shape), str(video.dtype))).encode())
+
+    for start in range(0, len(video), chunk_size):
+        hasher.update(np.ascontiguousarray(video[start : start + chunk_size]).data)
+
+    return hasher.hexdigest()
+
+
+def video_fingerprint(project_container: project.Project, video: np.array) -> str:
+    """
+    Identify a video without reading its pixels, if it is the frame store of the project.
+
+    The frame store is identified by the checksum that the manifest recorded when it was written,
+    together with its shape, size and modification time.
+    Any other video, e.g. a :class:`VFLabel.io.LazyVideo`, is hashed by :func:`video_digest`.
+
+    :param project_container: Project the video belongs to
+    :type project_container: project.Project
+    :param video: Video of shape FRAMES x HEIGHT x WIDTH x CHANNELS
+    :type video: np.array
+    :return: Hex digest or description of the video
+    :rtype: str
+    """
+    if "video" in project_container and isinstance(video, np.memmap):
+        section = project_container.info("video")
+        path = os.path.join(project_container.path, section["file"])
+
+        if (
+            video.filename is not None
+            and os.path.exists(path)
+            and os.path.samefile(video.filename, path)
+            and tuple(video.shape) == tuple(section["shape"])
+        ):
+            stat = os.stat(path)
+            return repr(
+                [
+                    section["file"],
+                    section["shape"],
+                    section["dtype"],
+                    section["checksum"],
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                ]
+            )
+
+    return video_digest(video)
+
+
+def tracking_key(video_id: str, **tracking_arguments: Any) -> str:
+    """
+    Compute the cache key of tracking a video with the given arguments.
+
+    :param video_id: Identification of the video, see :func:`video_fingerprint`
+    :type video_id: str
+    :param tracking_arguments: Keyword arguments of :func:`VFLabel.nn.point_tracking.track_points_windowed`
+    :return: Hex digest of the video, the tracking parameters and the checkpoint
+    :rtype: str
+    """
+    checkpoint = tracking_arguments.get(
+        "checkpoint", point_tracking.COTRACKER_CHECKPOINT
+    )
+    checkpoint_stat = os.stat(checkpoint) if os.path.exists(checkpoint) else None
+
+    parameters = {
+        key: repr(value)
+        for key, value in tracking_arguments.items()
+        if key not in _UNKEYED_ARGUMENTS
+    }
+    parameters["checkpoint"] = [
+        os.path.abspath(checkpoint),
+        checkpoint_stat.st_size if checkpoint_stat else None,
+        checkpoint_stat.st_mtime_ns if checkpoint_stat else None,
+    ]
+
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(video_id.encode())
+    hasher.update(repr(sorted(parameters.items())).encode())
+    return hasher.hexdigest()
+
+
+def project_tracking_roi(
+    project_container: project.Project,
+    points: np.array,
+    frame_size: Tuple[int, int],
+    **roi_arguments: Any,
+) -> Tuple[int, int, int, int]:
+    """
+    Return the region of interest that all tracking runs of a project share.
+
+    The region is computed by :func:`VFLabel.nn.point_tracking.tracking_roi` on first use and stored
+    in the project. Later calls return it unchanged, such that moving a click does not invalidate
+    the cached tracks. It only grows if a point lies outside of it.
+
+    :param project_container: Project the region is stored in
+    :type project_container: project.Project
+    :param points: Points of shape NUM_POINTS x 2 as [x, y], e.g. the clicked laserpoints
+    :type points: np.array
+    :param frame_size: Height and width of the frames
+    :type frame_size: Tuple[int, int]
+    :param roi_arguments: Keyword arguments passed on to :func:`VFLabel.nn.point_tracking.tracking_roi`
+    :return: Region of interest as (x_min, y_min, x_max, y_max), max exclusive
+    :rtype: Tuple[int, int, int, int]
+    """
+    points = np.asarray(points, dtype=float)
+    points = points[~np.isnan(points).any(axis=-1)]
+
+    if TRACKING_ROI_NAME in project_container:
+        stored = tuple(int(value) for value in project_container[TRACKING_ROI_NAME])
+        x_min, y_min, x_max, y_max = stored
+        if (
+            (points[:, 0] >= x_min)
+            & (points[:, 0] < x_max)
+            & (points[:, 1] >= y_min)
+            & (points[:, 1] < y_max)
+        ).all():
+            return stored
+
+    roi = point_tracking.tracking_roi(points, frame_size, **roi_arguments)
+    if TRACKING_ROI_NAME in project_container:
+        roi = (*np.minimum(roi[:2], stored[:2]), *np.maximum(roi[2:], stored[2:]))
+        roi = tuple(int(value) for value in roi)
+
+    project_container.write_array(TRACKING_ROI_NAME, np.array(roi, dtype=np.int64))
+    return roi
+
+
+def track_points_cached(
+    project_container: project.Project,
+    video: np.array,
+    query_points: np.array,
+    ids: np.array,
+    grid_size: Tuple[int, int],
+    name: str = "predicted",
+    **tracking_arguments: Any,
+) -> Tuple[np.array, np.array, str]:
+    """
+    Track laserpoints with :func:`VFLabel.nn.point_tracking.track_points_windowed`, reusing stored tracks.
+
+    If the point tracks of the given name were tracked with the same key, i.e. the same video,
+    tracking parameters and checkpoint, and with the same grid size, only laserpoints whose query points changed since are
+    tracked again, and the tracks of removed laserpoints are cleared.
+    Otherwise all query points are tracked. Nothing is written, the caller stores the tracks
+    with :func:`VFLabel.io.write_point_tracks` and the queries and the key with
+    :func:`VFLabel.io.write_point_track_queries`.
+
+    :param project_container: Project the tracks are stored in
+    :type project_container: project.Project
+    :param video: Video of shape FRAMES x HEIGHT x WIDTH x CHANNELS
+    :type video: np.array
+    :param query_points: Query points of shape NUM_POINTS x 3 as [frame, x, y]
+    :type query_points: np.array
+    :param ids: [x_id, y_id] of shape NUM_POINTS x 2
+    :type ids: np.array
+    :param grid_size: Height and width of the laser grid
+    :type grid_size: Tuple[int, int]
+    :param name: Name of the point tracks, e.g. "predicted"
+    :type name: str
+    :param tracking_arguments: Keyword arguments passed on to :func:`VFLabel.nn.point_tracking.track_points_windowed`
+    :return: Points of shape FRAMES x GRID_HEIGHT x GRID_WIDTH x 2, labels of shape FRAMES x GRID_HEIGHT x GRID_WIDTH and the key
+    :rtype: Tuple[np.array, np.array, str]
+    """
+    ids = np.asarray(ids, dtype=int)
+    key = tracking_key(
+        video_fingerprint(project_container, video), **tracking_arguments
+    )
+
+    grid_height, grid_width = grid_size
+    if (
+        point_tracks.has_point_tracks(project_container, name)
+        and point_tracks.read_point_track_queries_key(project_container, name) == key
+        and project_container.info(f"{name}_points")["shape"][1:3]
+        == [grid_height, grid_width]
+    ):
+        changed, removed = point_tracking.changed_query_points(
+            *point_tracks.read_point_track_queries(project_container, name),
+            query_points,
+            ids,
+        )
+        points, labels = point_tracks.read_point_tracks(project_container, name)
+        points, labels = point_tracking.retrack_points(
+            video,
+            points,
+            labels,
+            query_points[changed],
+            ids[changed],
+            **tracking_arguments,
+        )
+        points[:, removed[:, 1], removed[:, 0]] = np.nan
+        labels[:, removed[:, 1], removed[:, 0]] = np.nan
+        return points, labels, key
+
+    tracked_points, visibility = point_tracking.track_points_windowed(
+        video, query_points, **tracking_arguments
+    )
+    points = data.cotracker_to_numpy_array(tracked_points, ids, grid_width, grid_height)
+    labels = data.labels_to_numpy_array(visibility, ids, grid_width, grid_height)
+    return points, labels, key
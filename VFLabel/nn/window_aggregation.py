@@ -0,0 +1,94 @@
+from typing import List, Tuple
+
+import numpy as np
+
+# How predictions of overlapping windows are weighted when they are blended:
+#   uniform: every window contributes equally, i.e. a plain average.
+#   hann:    frames close to a window border contribute less than frames in its center,
+#            where the tracker saw context in both temporal directions.
+WINDOW_WEIGHTINGS: List[str] = ["uniform", "hann"]
+
+
+def window_weights(window_length: int, weighting: str = "uniform") -> np.array:
+    """
+    Return the per frame blending weights of a window.
+
+    :param window_length: Number of frames of the window
+    :type window_length: int
+    :param weighting: One of :data:`WINDOW_WEIGHTINGS`
+    :type weighting: str
+    :return: Strictly positive weights of shape FRAMES
+    :rtype: np.array
+    """
+    if weighting == "uniform":
+        return np.ones(window_length)
+
+    if weighting == "hann":
+        # Drop the zeros at both ends, such that frames only covered by one window keep a weight.
+        return np.hanning(window_length + 2)[1:-1]
+
+    raise ValueError(
+        f"Unknown window weighting {weighting}, expected one of {WINDOW_WEIGHTINGS}."
+    )
+
+
+class WindowAggregator:
+    """
+    Blends the predictions of overlapping tracking windows.
+
+    Windows are reduced in place as they arrive, so only the accumulators of the
+    whole video are kept in memory. Points are blended by a weighted average,
+    visibility by a weighted vote, where a point is visible if more than half of the
+    weight voted for it. All accumulators are float64, such that they can not overflow
+    no matter how many windows overlap.
+
+    :param video_length: Number of frames of the video
+    :type video_length: int
+    :param num_points: Number of tracked points
+    :type num_points: int
+    :param weighting: One of :data:`WINDOW_WEIGHTINGS`
+    :type weighting: str
+    """
+
+    def __init__(self, video_length: int, num_points: int, weighting: str = "uniform"):
+        # Fail early instead of after the first window was tracked.
+        window_weights(1, weighting)
+
+        self.weighting: str = weighting
+        self._point_sums = np.zeros([video_length, num_points, 2], dtype=np.float64)
+        self._visibility_sums = np.zeros([video_length, num_points], dtype=np.float64)
+        self._weight_sums = np.zeros([video_length, 1], dtype=np.float64)
+
+    def add(self, start: int, end: int, points: np.array, visibility: np.array) -> None:
+        """
+        Add the predictions of a window.
+
+        :param start: First frame of the window
+        :type start: int
+        :param end: Frame after the last frame of the window
+        :type end: int
+        :param points: Points of shape FRAMES x NUM_POINTS x 2
+        :type points: np.array
+        :param visibility: Visibility of shape FRAMES x NUM_POINTS
+        :type visibility: np.array
+        """
+        weights = window_weights(end - start, self.weighting)[:, None]
+
+        self._point_sums[start:end] += points * weights[:, :, None]
+        self._visibility_sums[start:end] += visibility * weights
+        self._weight_sums[start:end] += weights
+
+    def result(self) -> Tuple[np.array, np.array]:
+        """
+        Return the blended points and the voted visibility.
+
+        Frames that are not covered by any window are NaN.
+
+        :return: Points of shape FRAMES x NUM_POINTS x 2 and visibility of shape FRAMES x NUM_POINTS
+        :rtype: Tuple[np.array, np.array]
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            points = self._point_sums / self._weight_sums[:, :, None]
+            visibility = (self._visibility_sums / self._weight_sums > 0.5) * 1.0
+
+        return points, visibility
@@ -38,9 +38,8 @@ if __name__ == "__main__":
             layout = QHBoxLayout(central_widget)
 
             project_path = VFLabel.utils.defines.TEST_PROJECT_PATH
-            video_path = os.path.join(project_path, "video")
 
-            video = np.array(io.read_images_from_folder(video_path, is_gray=True))[:175]
+            video = np.array(io.read_project_video(project_path)[:175, :, :, 0])
             dict = io.dict_from_json("projects/test_project/predicted_laserpoints.json")
             points, ids = io.point_dict_to_cotracker(dict)
 
@@ -25,7 +25,6 @@ import json
 import os
 import torch
 
-
 if __name__ == "__main__":
 
     class MainWindow(QMainWindow):
@@ -38,13 +37,8 @@ if __name__ == "__main__":
             layout = QHBoxLayout(central_widget)
 
             project_path = VFLabel.utils.defines.TEST_PROJECT_PATH
-            video_path = os.path.join(project_path, "video")
-            vf_segmentation_path = os.path.join(project_path, "vocalfold_segmentation")
-            glottis_segmentation_path = os.path.join(
-                project_path, "glottis_segmentation"
-            )
-
-            video = np.array(io.read_images_from_folder(video_path, is_gray=True))[:175]
+            video_rgb = np.array(io.read_project_video(project_path)[:175])
+            video = np.ascontiguousarray(video_rgb[:, :, :, 0])
             dict = io.dict_from_json("projects/test_project/predicted_laserpoints.json")
             points, ids = io.point_dict_to_cotracker(dict)
 
@@ -69,20 +63,20 @@ if __name__ == "__main__":
                 video.shape[0], len(dict["Frame0"])
             )
 
-            vocalfold_segmentations = np.array(
-                io.read_images_from_folder(vf_segmentation_path, is_gray=True)
-            )[:175]
-            glottis_segmentations = np.array(
-                io.read_images_from_folder(glottis_segmentation_path, is_gray=True)
-            )[:175]
-            filtered_points = pi.filter_points_not_on_vocalfold(
-                points_subpix, vocalfold_segmentations
+            vocalfold_segmentations, vocalfold_width = (
+                VFLabel.io.read_project_packed_segmentations(project_path, "vocalfold")
+            )
+            glottis_segmentations, glottis_width = (
+                VFLabel.io.read_project_packed_segmentations(project_path, "glottis")
             )
-            filtered_points = pi.filter_points_on_glottis(
-                points_subpix, glottis_segmentations
+            filtered_points = pi.filter_points_by_segmentations(
+                points_subpix,
+                vocalfold_segmentations[:175],
+                glottis_segmentations[:175],
+                vocalfold_width,
+                glottis_width,
             )
 
-            video_rgb = np.array(io.read_images_from_folder(video_path))[:175]
             qvideo: List[QImage] = VFLabel.utils.transforms.vid_2_QImage(video_rgb)
             # Set up the zoomable view
             self.view_1 = VFLabel.gui_graphics_view.labeledPoints.LabeledPoints(qvideo)
@@ -0,0 +1,76 @@
+import argparse
+
+import numpy as np
+import torch
+
+import VFLabel.cv.point_interpolation
+from reference_loops import (
+    loop_fill_nan_border_values,
+    loop_fill_nan_border_values_2d,
+    print_timings,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "Border Padding Benchmark",
+        "Compare the vectorized NaN border padding against the per point implementation.",
+    )
+
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--grid_height", type=int, default=18)
+    parser.add_argument("--grid_width", type=int, default=18)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    # Tracks with leading, trailing and interior NaNs, and some without any valid frame.
+    shape = [args.frames, args.grid_height, args.grid_width, 2]
+    points = rng.uniform(0, 256, shape)
+    frames = np.arange(args.frames)[:, None, None]
+    starts = rng.integers(0, args.frames // 4, shape[1:3])
+    ends = rng.integers(args.frames // 2, args.frames + 1, shape[1:3])
+    points[(frames < starts) | (frames >= ends)] = np.nan
+    points[rng.random(shape[:-1]) < 0.1] = np.nan
+    points[:, 0, 0] = np.nan
+    points = torch.from_numpy(points)
+
+    torch.testing.assert_close(
+        VFLabel.cv.point_interpolation.fill_nan_border_values_2d(points.clone()),
+        loop_fill_nan_border_values_2d(points.clone()),
+        rtol=0,
+        atol=0,
+        equal_nan=True,
+    )
+
+    tracks = points.reshape(args.frames, -1, 2).transpose(0, 1).contiguous()
+    torch.testing.assert_close(
+        VFLabel.cv.point_interpolation.fill_nan_border_values(tracks.clone()),
+        loop_fill_nan_border_values(tracks.clone()),
+        rtol=0,
+        atol=0,
+        equal_nan=True,
+    )
+
+    print(
+        f"{args.grid_height}x{args.grid_width} points x {args.frames} frames, identical output"
+    )
+    print_timings(
+        {
+            "loop 2d": lambda: loop_fill_nan_border_values_2d(points.clone()),
+            "vectorized 2d": lambda: VFLabel.cv.point_interpolation.fill_nan_border_values_2d(
+                points.clone()
+            ),
+        },
+        args.repeat,
+    )
+    print_timings(
+        {
+            "loop": lambda: loop_fill_nan_border_values(tracks.clone()),
+            "vectorized": lambda: VFLabel.cv.point_interpolation.fill_nan_border_values(
+                tracks.clone()
+            ),
+        },
+        args.repeat,
+    )
@@ -0,0 +1,76 @@
+import argparse
+
+import numpy as np
+import scipy.interpolate
+import torch
+
+import VFLabel.cv.point_interpolation
+from reference_loops import loop_interpolate_nans_2d, print_timings
+
+
+def synthetic_tracks(num_frames, grid_height, grid_width, seed):
+    rng = np.random.default_rng(seed)
+
+    # Oscillating laserpoints with random gaps, the first and last frame of every track are valid.
+    frames = np.arange(num_frames)[:, None, None, None]
+    phases = rng.uniform(0, 2 * np.pi, [1, grid_height, grid_width, 2])
+    points = 100 + 10 * np.sin(frames / 10 + phases)
+    points[rng.random(points.shape[:-1]) < 0.3] = np.nan
+    points[[0, -1]] = 100
+    return torch.from_numpy(points)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "Gap Interpolation Benchmark",
+        "Compare the vectorized gap interpolation against the per point implementation.",
+    )
+
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--grid_height", type=int, default=18)
+    parser.add_argument("--grid_width", type=int, default=18)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+
+    points = synthetic_tracks(args.frames, args.grid_height, args.grid_width, args.seed)
+
+    # Linear interpolation reproduces the previous implementation.
+    reference = loop_interpolate_nans_2d(points.clone())
+    result = VFLabel.cv.point_interpolation.interpolate_gaps(points)
+    torch.testing.assert_close(result, reference, rtol=0, atol=0, equal_nan=True)
+
+    # PCHIP reproduces scipy.
+    pchip = VFLabel.cv.point_interpolation.interpolate_gaps(points, method="pchip")
+    tracks = points.reshape(args.frames, -1, 2).numpy()
+    for track, interpolated in zip(
+        tracks.transpose(1, 0, 2),
+        pchip.reshape(args.frames, -1, 2).numpy().transpose(1, 0, 2),
+    ):
+        valid = ~np.isnan(track).any(axis=-1)
+        expected = scipy.interpolate.PchipInterpolator(
+            np.flatnonzero(valid), track[valid]
+        )(np.arange(args.frames))
+        np.testing.assert_allclose(interpolated, expected, rtol=1e-10, atol=1e-10)
+
+    # Gaps longer than max_gap are kept.
+    limited = VFLabel.cv.point_interpolation.interpolate_gaps(points, max_gap=2)
+    assert torch.isnan(limited).sum() <= torch.isnan(points).sum()
+
+    timings = {
+        "loop": lambda: loop_interpolate_nans_2d(points.clone()),
+        "linear": lambda: VFLabel.cv.point_interpolation.interpolate_gaps(points),
+        "cubic": lambda: VFLabel.cv.point_interpolation.interpolate_gaps(
+            points, method="cubic"
+        ),
+        "pchip": lambda: VFLabel.cv.point_interpolation.interpolate_gaps(
+            points, method="pchip"
+        ),
+    }
+
+    print(
+        f"{args.grid_height}x{args.grid_width} points x {args.frames} frames, "
+        f"linear matches the loop, pchip matches scipy"
+    )
+    print_timings(timings, args.repeat)
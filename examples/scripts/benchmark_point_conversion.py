@@ -0,0 +1,123 @@
+import argparse
+
+import numpy as np
+
+import VFLabel.io.data
+from reference_loops import (
+    loop_cotracker_to_numpy_array,
+    loop_cotracker_to_point_dict,
+    loop_labels_to_numpy_array,
+    loop_point_dict_to_cotracker,
+    loop_point_dict_to_numpy,
+    print_timings,
+)
+
+
+def assert_equal_dicts(a, b):
+    assert a.keys() == b.keys()
+    for key in a:
+        assert a[key] == b[key], key
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "Point Conversion Benchmark",
+        "Compare the vectorized point conversions against the previous loop based implementation.",
+    )
+
+    parser.add_argument("--grid_width", type=int, default=18)
+    parser.add_argument("--grid_height", type=int, default=18)
+    parser.add_argument("--frames", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=3)
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    num_points = args.grid_width * args.grid_height
+
+    # Every laser point of the grid is tracked in every frame.
+    y_ids, x_ids = np.meshgrid(
+        np.arange(args.grid_height), np.arange(args.grid_width), indexing="ij"
+    )
+    ids = np.stack([x_ids.ravel(), y_ids.ravel()], axis=-1)
+    per_frame_points = rng.uniform(0, 512, [args.frames, num_points, 2])
+    per_frame_labels = rng.integers(0, 3, [args.frames, num_points]).astype(float)
+    point_dict = VFLabel.io.data.cotracker_to_point_dict(per_frame_points, ids[:, ::-1])
+
+    print(f"{args.frames} frames, {args.grid_height}x{args.grid_width} grid")
+
+    # Check that both implementations agree before timing them.
+    np.testing.assert_array_equal(
+        loop_point_dict_to_numpy(
+            point_dict, args.grid_width, args.grid_height, args.frames
+        ),
+        VFLabel.io.data.point_dict_to_numpy(
+            point_dict, args.grid_width, args.grid_height, args.frames
+        ),
+    )
+    for expected, actual in zip(
+        loop_point_dict_to_cotracker(point_dict),
+        VFLabel.io.data.point_dict_to_cotracker(point_dict),
+    ):
+        np.testing.assert_array_equal(expected, actual)
+    assert_equal_dicts(
+        loop_cotracker_to_point_dict(per_frame_points, ids),
+        VFLabel.io.data.cotracker_to_point_dict(per_frame_points, ids),
+    )
+    np.testing.assert_array_equal(
+        loop_cotracker_to_numpy_array(
+            per_frame_points, ids, args.grid_width, args.grid_height
+        ),
+        VFLabel.io.data.cotracker_to_numpy_array(
+            per_frame_points, ids, args.grid_width, args.grid_height
+        ),
+    )
+    np.testing.assert_array_equal(
+        loop_labels_to_numpy_array(
+            per_frame_labels, ids, args.grid_width, args.grid_height
+        ),
+        VFLabel.io.data.labels_to_numpy_array(
+            per_frame_labels, ids, args.grid_width, args.grid_height
+        ),
+    )
+
+    conversions = {
+        "point_dict_to_numpy": (
+            lambda: loop_point_dict_to_numpy(
+                point_dict, args.grid_width, args.grid_height, args.frames
+            ),
+            lambda: VFLabel.io.data.point_dict_to_numpy(
+                point_dict, args.grid_width, args.grid_height, args.frames
+            ),
+        ),
+        "point_dict_to_cotracker": (
+            lambda: loop_point_dict_to_cotracker(point_dict),
+            lambda: VFLabel.io.data.point_dict_to_cotracker(point_dict),
+        ),
+        "cotracker_to_point_dict": (
+            lambda: loop_cotracker_to_point_dict(per_frame_points, ids),
+            lambda: VFLabel.io.data.cotracker_to_point_dict(per_frame_points, ids),
+        ),
+        "cotracker_to_numpy_array": (
+            lambda: loop_cotracker_to_numpy_array(
+                per_frame_points, ids, args.grid_width, args.grid_height
+            ),
+            lambda: VFLabel.io.data.cotracker_to_numpy_array(
+                per_frame_points, ids, args.grid_width, args.grid_height
+            ),
+        ),
+        "labels_to_numpy_array": (
+            lambda: loop_labels_to_numpy_array(
+                per_frame_labels, ids, args.grid_width, args.grid_height
+            ),
+            lambda: VFLabel.io.data.labels_to_numpy_array(
+                per_frame_labels, ids, args.grid_width, args.grid_height
+            ),
+        ),
+    }
+    for name, (loop_function, vectorized_function) in conversions.items():
+        print_timings(
+            {f"{name} loop": loop_function, name: vectorized_function},
+            args.repeats,
+            name_width=max(len(name) for name in conversions) + len(" loop"),
+        )
@@ -0,0 +1,57 @@
+import argparse
+import time
+
+import numpy as np
+import torch
+
+import VFLabel.io
+import VFLabel.nn.point_tracking
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "Point Tracking Benchmark",
+        "Compare the frames per second of the sequential and the batched windowed tracking.",
+    )
+
+    parser.add_argument("--video", type=str, required=True)
+    parser.add_argument("--clicked_points", type=str, required=True)
+    parser.add_argument("--frames", type=int, default=None)
+    parser.add_argument(
+        "--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu"
+    )
+    parser.add_argument("--batch_size", type=int, default=4)
+    parser.add_argument("--num_threads", type=int, default=None)
+
+    args = parser.parse_args()
+
+    frame_range = (0, args.frames) if args.frames else None
+    video = VFLabel.io.read_video(args.video, frame_range)
+    points, _ = VFLabel.io.point_dict_to_cotracker(
+        VFLabel.io.dict_from_json(args.clicked_points)
+    )
+
+    # Load the model once, such that loading is not part of the measurements.
+    VFLabel.nn.point_tracking.get_cotracker_model(device=args.device)
+
+    results = {}
+    for requery in VFLabel.nn.point_tracking.REQUERY_MODES:
+        start = time.perf_counter()
+        results[requery] = VFLabel.nn.point_tracking.track_points_windowed(
+            video,
+            points,
+            device=args.device,
+            requery=requery,
+            batch_size=args.batch_size,
+            num_threads=args.num_threads,
+        )
+        elapsed = time.perf_counter() - start
+        print(f"{requery:<12} {len(video) / elapsed:8.1f} FPS")
+
+    sequential_points, sequential_visibility = results["sequential"]
+    for requery in ["clicked", "first_pass"]:
+        tracked_points, visibility = results[requery]
+        distance = np.linalg.norm(tracked_points - sequential_points, axis=-1)
+        print(
+            f"{requery:<12} mean distance to sequential: {np.nanmean(distance):.3f}px, "
+            f"visibility agreement: {(visibility == sequential_visibility).mean():.3f}"
+        )
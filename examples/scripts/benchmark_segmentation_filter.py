@@ -0,0 +1,79 @@
+import argparse
+import tempfile
+
+import numpy as np
+
+import VFLabel.cv.point_interpolation
+import VFLabel.io as io
+from reference_loops import loop_filter_points, print_timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "Segmentation Filter Benchmark",
+        "Compare the combined segmentation filter against the per frame implementation.",
+    )
+
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--height", type=int, default=256)
+    parser.add_argument("--width", type=int, default=256)
+    parser.add_argument("--points", type=int, default=324)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    shape = [args.frames, args.height, args.width]
+    vocalfold = (rng.random(shape) > 0.3).astype(np.uint8) * 255
+    glottis = (rng.random(shape) > 0.7).astype(np.uint8) * 255
+
+    # Points strictly inside the image, such that the old implementation neither wraps nor fails.
+    points = rng.uniform(
+        1, [args.width - 1, args.height - 1], [args.frames, args.points, 2]
+    )
+    points[rng.random(points.shape[:-1]) < 0.1] = np.nan
+
+    with tempfile.TemporaryDirectory() as project_path:
+        project_container = io.Project(project_path)
+        io.write_segmentation_masks(project_container, "vocalfold", vocalfold)
+        io.write_segmentation_masks(project_container, "glottis", glottis)
+        packed_vocalfold, vocalfold_width = io.read_project_packed_segmentations(
+            project_path, "vocalfold"
+        )
+        packed_glottis, glottis_width = io.read_project_packed_segmentations(
+            project_path, "glottis"
+        )
+
+        expected = loop_filter_points(
+            loop_filter_points(points, vocalfold, True), glottis, False
+        )
+        filtered = VFLabel.cv.point_interpolation.filter_points_by_segmentations(
+            points, vocalfold, glottis
+        )
+        filtered_packed = VFLabel.cv.point_interpolation.filter_points_by_segmentations(
+            points, packed_vocalfold, packed_glottis, vocalfold_width, glottis_width
+        )
+        assert np.array_equal(filtered, expected, equal_nan=True)
+        assert np.array_equal(filtered_packed, expected, equal_nan=True)
+
+        timings = {
+            "loop": lambda: loop_filter_points(
+                loop_filter_points(points, vocalfold, True), glottis, False
+            ),
+            "combined": lambda: VFLabel.cv.point_interpolation.filter_points_by_segmentations(
+                points, vocalfold, glottis
+            ),
+            "combined packed": lambda: VFLabel.cv.point_interpolation.filter_points_by_segmentations(
+                points, packed_vocalfold, packed_glottis, vocalfold_width, glottis_width
+            ),
+        }
+
+        print(
+            f"{args.points} points x {args.frames} frames of {args.height}x{args.width}, identical output"
+        )
+        print_timings(timings, args.repeat)
+
+        print(
+            f"unpacked masks {(vocalfold.nbytes + glottis.nbytes) / 2**20:.1f}MiB, "
+            f"packed {(packed_vocalfold.nbytes + packed_glottis.nbytes) / 2**20:.1f}MiB"
+        )
@@ -0,0 +1,40 @@
+import argparse
+
+import numpy as np
+import torch
+
+import VFLabel.cv.point_interpolation
+from reference_loops import loop_smooth_points, print_timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "Smoothing Benchmark",
+        "Compare the throughput of the batched smoothing methods against the per point implementation.",
+    )
+
+    parser.add_argument("--points", type=int, default=324)
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    # Noisy oscillating tracks with NaN borders and interior gaps.
+    frames = np.arange(args.frames)[None, :, None]
+    points = 100 + 10 * np.sin(frames / 10 + rng.uniform(0, 6, [args.points, 1, 2]))
+    points = points + rng.normal(0, 0.5, points.shape)
+    points[:, : args.frames // 20] = np.nan
+    points[rng.random(points.shape[:-1]) < 0.05] = np.nan
+    points = torch.from_numpy(points)
+
+    timings = {"loop": lambda: loop_smooth_points(points.clone())}
+    for method in VFLabel.cv.point_interpolation.SMOOTHING_METHODS:
+        timings[method] = (
+            lambda method=method: VFLabel.cv.point_interpolation.smooth_points(
+                points.clone(), method=method
+            )
+        )
+
+    print(f"{args.points} points x {args.frames} frames")
+    print_timings(timings, args.repeat)
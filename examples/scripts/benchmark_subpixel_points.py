@@ -0,0 +1,71 @@
+import argparse
+
+import numpy as np
+import torch
+
+import VFLabel.cv.point_interpolation
+from reference_loops import loop_compute_subpixel_points, print_timings
+
+
+def synthetic_data(num_frames, num_points, height, width, seed):
+    rng = np.random.default_rng(seed)
+
+    # Gaussian spots on a noisy background, one per point and frame.
+    positions = rng.uniform(
+        [8, 8], [width - 8, height - 8], [num_frames, num_points, 2]
+    )
+    video = rng.integers(0, 40, [num_frames, height, width, 1]).astype(np.float64)
+    y, x = np.mgrid[0:height, 0:width]
+    for frame, frame_positions in enumerate(positions):
+        for px, py in frame_positions:
+            video[frame, :, :, 0] += 200 * np.exp(
+                -((x - px) ** 2 + (y - py) ** 2) / 2.0
+            )
+    video = np.clip(video, 0, 255).astype(np.uint8)
+
+    frames = np.repeat(np.arange(num_frames), num_points)[:, None]
+    points = np.concatenate([frames, positions.reshape(-1, 2)], axis=1)
+
+    # Runs of visible and invisible labels of random length.
+    labels = (rng.random([num_frames * num_points, 1]) > 0.3) * 1
+    return torch.from_numpy(points), torch.from_numpy(labels), torch.from_numpy(video)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "Subpixel Point Benchmark",
+        "Compare the vectorized compute_subpixel_points against the per point implementation.",
+    )
+
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--points", type=int, default=100)
+    parser.add_argument("--height", type=int, default=128)
+    parser.add_argument("--width", type=int, default=128)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+
+    points, labels, video = synthetic_data(
+        args.frames, args.points, args.height, args.width, args.seed
+    )
+
+    reference = loop_compute_subpixel_points(points, labels, video, args.points)
+    result = VFLabel.cv.point_interpolation.compute_subpixel_points(
+        points, labels, video, args.points
+    )
+    for expected, actual in zip(reference, result):
+        torch.testing.assert_close(actual, expected, rtol=0, atol=0, equal_nan=True)
+
+    print(f"{args.points} points x {args.frames} frames, identical output")
+    print_timings(
+        {
+            "loop": lambda: loop_compute_subpixel_points(
+                points, labels, video, args.points
+            ),
+            "vectorized": lambda: VFLabel.cv.point_interpolation.compute_subpixel_points(
+                points, labels, video, args.points
+            ),
+        },
+        args.repeat,
+    )
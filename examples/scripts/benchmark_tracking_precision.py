@@ -0,0 +1,70 @@
+import argparse
+import time
+
+import numpy as np
+import torch
+
+import VFLabel.io
+import VFLabel.nn.point_tracking
+
+# Input preparations that are compared against the full resolution float32 RGB path.
+CONFIGURATIONS = {
+    "grayscale": dict(grayscale=True),
+    "bfloat16": dict(dtype=torch.bfloat16),
+    "bfloat16 grayscale": dict(dtype=torch.bfloat16, grayscale=True),
+    "float16 grayscale": dict(dtype=torch.float16, grayscale=True),
+    "scale 0.75": dict(scale=0.75),
+    "scale 0.5": dict(scale=0.5),
+    "bfloat16 grayscale scale 0.5": dict(
+        dtype=torch.bfloat16, grayscale=True, scale=0.5
+    ),
+}
+
+
+def run(video, points, device, **kwargs):
+    start = time.perf_counter()
+    result = VFLabel.nn.point_tracking.track_points_windowed(
+        video, points, device=device, **kwargs
+    )
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "Tracking Precision Benchmark",
+        "Compare speed and accuracy of reduced precision and downscaled tracking inputs on the CPU.",
+    )
+
+    parser.add_argument(
+        "--video", type=str, default="assets/test_data/test_video_1.avi"
+    )
+    parser.add_argument("--clicked_points", type=str, required=True)
+    parser.add_argument("--frames", type=int, default=175)
+    parser.add_argument("--num_threads", type=int, default=None)
+
+    args = parser.parse_args()
+
+    if args.num_threads is not None:
+        torch.set_num_threads(args.num_threads)
+
+    video = VFLabel.io.read_video(args.video, (0, args.frames))
+    points, _ = VFLabel.io.point_dict_to_cotracker(
+        VFLabel.io.dict_from_json(args.clicked_points)
+    )
+
+    # Load the model once, such that loading is not part of the measurements.
+    VFLabel.nn.point_tracking.get_cotracker_model(device="cpu")
+
+    (reference_points, reference_visibility), reference_time = run(video, points, "cpu")
+    print(f"{'reference':<30} {len(video) / reference_time:6.2f} FPS")
+
+    for name, kwargs in CONFIGURATIONS.items():
+        (tracked_points, visibility), elapsed = run(video, points, "cpu", **kwargs)
+        distance = np.linalg.norm(tracked_points - reference_points, axis=-1)
+        print(
+            f"{name:<30} {len(video) / elapsed:6.2f} FPS, "
+            f"speedup: {reference_time / elapsed:5.2f}x, "
+            f"mean error: {np.nanmean(distance):6.3f}px, "
+            f"max error: {np.nanmax(distance):7.3f}px, "
+            f"visibility agreement: {(visibility == reference_visibility).mean():.3f}"
+        )
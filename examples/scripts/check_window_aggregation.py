@@ -0,0 +1,85 @@
+import argparse
+
+import numpy as np
+
+from VFLabel.nn.window_aggregation import WindowAggregator
+
+
+def merge_windows_reference(windows, video_length, num_query_points):
+    # The averaging used before the aggregator, including its uint8 visibility counter.
+    final_points = np.zeros([video_length, num_query_points, 2], dtype=float)
+    final_visibility = np.zeros([video_length, num_query_points], dtype=np.uint8)
+    counts = np.zeros([video_length, num_query_points, 2], dtype=np.float32)
+
+    for start_idx, end_idx, pred_tracks, pred_visibility in windows:
+        final_points[start_idx:end_idx] += pred_tracks
+        final_visibility[start_idx:end_idx] += pred_visibility
+        counts[start_idx:end_idx] += 1
+
+    final_points /= counts
+    final_visibility = (final_visibility / counts[:, :, 0] > 0.5) * 1.0
+
+    return final_points, final_visibility
+
+
+def random_windows(rng, video_length, num_points, window_size, stride):
+    windows = []
+    for start in range(0, max(video_length - window_size, 0) + stride, stride):
+        end = min(start + window_size, video_length)
+        windows.append(
+            (
+                start,
+                end,
+                rng.uniform(0, 512, [end - start, num_points, 2]).astype(np.float32),
+                rng.random([end - start, num_points]) > 0.3,
+            )
+        )
+    return windows
+
+
+def aggregate(windows, video_length, num_points, weighting):
+    aggregator = WindowAggregator(video_length, num_points, weighting)
+    for window in windows:
+        aggregator.add(*window)
+    return aggregator.result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "Window Aggregation Check",
+        "Check that uniform window aggregation reproduces the previous averaging.",
+    )
+
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--points", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    for window_size, stride in [(50, 25), (50, 10), (48, 16), (7, 3)]:
+        windows = random_windows(rng, args.frames, args.points, window_size, stride)
+
+        reference = merge_windows_reference(windows, args.frames, args.points)
+        points, visibility = aggregate(windows, args.frames, args.points, "uniform")
+
+        np.testing.assert_allclose(points, reference[0], rtol=1e-12)
+        np.testing.assert_array_equal(visibility, reference[1])
+
+        blended_points, blended_visibility = aggregate(
+            windows, args.frames, args.points, "hann"
+        )
+        assert np.isfinite(blended_points).all()
+        print(
+            f"window size {window_size:3d}, stride {stride:3d}: uniform matches, "
+            f"hann visibility agreement {(blended_visibility == visibility).mean():.3f}"
+        )
+
+    # Frames covered by more than 255 windows overflowed the previous uint8 counter.
+    windows = [
+        (0, 1, np.zeros([1, 1, 2]), np.ones([1, 1], dtype=bool)) for _ in range(300)
+    ]
+    _, visibility = aggregate(windows, 1, 1, "uniform")
+    _, reference_visibility = merge_windows_reference(windows, 1, 1)
+    assert visibility[0, 0] == 1.0 and reference_visibility[0, 0] == 0.0
+    print("300 overlapping windows: visible, previously lost to a uint8 overflow")
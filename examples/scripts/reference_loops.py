@@ -0,0 +1,400 @@
+# Loop based implementations that were replaced by vectorized versions in VFLabel.
+# The benchmark scripts in this folder check that both agree and time them with measure.
+import re
+import timeit
+from typing import Any, Callable, Dict
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+import VFLabel.cv.subpixel_point_estimation as subpixel_point_estimation
+import VFLabel.utils.transforms
+
+
+def measure(function: Callable[[], Any], repeat: int) -> float:
+    # Best of repeat single runs, in seconds.
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def print_timings(
+    timings: Dict[str, Callable[[], Any]], repeat: int, name_width: int = 0
+) -> None:
+    # Speedups are relative to the first entry, usually the loop implementation.
+    width = max(name_width, *[len(name) for name in timings])
+    baseline = None
+    for name, function in timings.items():
+        elapsed = measure(function, repeat)
+        baseline = baseline if baseline else elapsed
+        print(
+            f"{name:<{width}} {elapsed * 1000:9.1f}ms  speedup {baseline / elapsed:6.1f}x"
+        )
+
+
+# Loop based conversions that were used before the conversion layer got vectorized.
+def loop_point_dict_to_numpy(point_dict, grid_width, grid_height, video_length):
+    base = np.zeros([video_length, grid_height, grid_width, 2]) * np.nan
+    sorted_keys = sorted(
+        point_dict.keys(), key=lambda x: int(re.search(r"\d+", x).group())
+    )
+
+    for key in sorted_keys:
+        for point in point_dict[key]:
+            frame = int(key.replace("Frame", ""))
+            base[frame, point["y_id"], point["x_id"]] = np.array(
+                [point["x_pos"], point["y_pos"]]
+            )
+
+    return base
+
+
+def loop_point_dict_to_cotracker(point_dict):
+    positions = []
+    ids = []
+    sorted_keys = sorted(
+        point_dict.keys(), key=lambda x: int(re.search(r"\d+", x).group())
+    )
+
+    for key in sorted_keys:
+        for point in point_dict[key]:
+            frame = int(key.replace("Frame", ""))
+            positions.append(np.array([frame, point["x_pos"], point["y_pos"]]))
+            ids.append(np.array([frame, point["x_id"], point["y_id"]]))
+
+    return np.array(positions), np.array(ids)
+
+
+def loop_cotracker_to_point_dict(per_frame_points, ids):
+    final_dict = {}
+    for frame_num, points in enumerate(per_frame_points):
+        point_list = []
+        for point, id in zip(points, ids):
+            point_list.append(
+                {
+                    "x_pos": point[0].item(),
+                    "y_pos": point[1].item(),
+                    "x_id": id[1].item(),
+                    "y_id": id[0].item(),
+                }
+            )
+        final_dict[f"Frame{frame_num}"] = point_list
+    return final_dict
+
+
+def loop_cotracker_to_numpy_array(per_frame_points, ids, grid_width, grid_height):
+    base = np.zeros([per_frame_points.shape[0], grid_height, grid_width, 2]) * np.nan
+
+    for frame, points in enumerate(per_frame_points):
+        for point, id in zip(points, ids):
+            base[frame, id[1], id[0]] = np.array([point[0], point[1]])
+
+    return base
+
+
+def loop_labels_to_numpy_array(per_frame_labels, ids, grid_width, grid_height):
+    base = np.zeros([per_frame_labels.shape[0], grid_height, grid_width]) * np.nan
+
+    for frame, labels in enumerate(per_frame_labels):
+        for label, id in zip(labels, ids):
+            base[frame, id[1], id[0]] = label
+
+    return base
+
+
+# Per point and per frame implementation that was used before compute_subpixel_points got vectorized.
+def loop_compute_subpixel_points(
+    point_predictions, labels, video, num_points_per_frame: int
+):
+    crops, y_windows, x_windows = subpixel_point_estimation.extractWindow(
+        video, point_predictions, device=point_predictions.device
+    )
+
+    # 0.1 Reshape points, classes and crops into per frame segments, such that we can easily extract a timeseries.
+    # I.e. shape is after this: NUM_POINTS x NUM_FRAMES x ...
+    point_predictions = point_predictions.reshape(
+        video.shape[0], num_points_per_frame, 3
+    )[:, :, [1, 2]].permute(1, 0, 2)
+    y_windows = y_windows.reshape(
+        video.shape[0], num_points_per_frame, crops.shape[-2], crops.shape[-1]
+    ).permute(1, 0, 2, 3)
+    x_windows = x_windows.reshape(
+        video.shape[0], num_points_per_frame, crops.shape[-2], crops.shape[-1]
+    ).permute(1, 0, 2, 3)
+    labels = labels.reshape(video.shape[0], num_points_per_frame).permute(1, 0)
+    crops = crops.reshape(
+        video.shape[0], num_points_per_frame, crops.shape[-2], crops.shape[-1]
+    ).permute(1, 0, 2, 3)
+
+    specular_duration = 5
+    # Iterate over every point and class as well as their respective crops
+    optimized_points = torch.zeros_like(point_predictions) * np.nan
+    optimized_points_on_crops = torch.zeros_like(point_predictions) * np.nan
+    for points_index, (points, label, crop) in enumerate(
+        zip(point_predictions, labels, crops)
+    ):
+
+        # Here it now gets super hacky.
+        # Convert label array to a string
+        labelstring = "".join(map(str, label.squeeze().tolist()))
+        # Replace 0s with V for visible
+        compute_string = labelstring.replace("1", "V")
+
+        # This regex looks for occurences of VXV, where X may be any mix of specularity or unidentifiable classifications but at most of length 5.
+        # If this is given, we will replace VXV by VIV, where X is replaced by that many Is.#
+        # Is indicate that we want to interpolate in these values.
+        compute_string = re.sub(
+            r"(V)([0]+)(V)",
+            lambda match: match.group(1) + "I" * len(match.group(2)) + match.group(3),
+            compute_string,
+        )
+        compute_string = re.sub(
+            r"(V)([0]+)(V)",
+            lambda match: match.group(1) + "I" * len(match.group(2)) + match.group(3),
+            compute_string,
+        )
+
+        # Finally, every part that couldn't be identified will be labeled as E for error.
+        compute_string = compute_string.replace("0", "E")
+        compute_string = compute_string.replace("1", "E")
+        compute_string = compute_string.replace("2", "E")
+        # print(compute_string)
+
+        # Compute sub-pixel position for each point labeled as visible (V)
+        for frame_index, label in enumerate(compute_string):
+            if label != "V":
+                continue
+
+            normalized_crop = crop[frame_index]
+            normalized_crop = (normalized_crop - normalized_crop.min()) / (
+                normalized_crop.max() - normalized_crop.min()
+            )
+
+            # Find local maximum in 5x5 crop
+            local_maximum = torch.unravel_index(
+                torch.argmax(normalized_crop[1:-1, 1:-1]), [5, 5]
+            )
+
+            # Add one again, since we removed the border from the local maximum lookup
+            x0, y0 = local_maximum[1] + 1, local_maximum[0] + 1
+
+            # Get 3x3 subwindow from crop, where the local maximum is centered.
+            neighborhood = 1
+            x_min = max(0, x0 - neighborhood)
+            x_max = min(normalized_crop.shape[1], x0 + neighborhood + 1)
+            y_min = max(0, y0 - neighborhood)
+            y_max = min(normalized_crop.shape[0], y0 + neighborhood + 1)
+
+            sub_image = normalized_crop[y_min:y_max, x_min:x_max]
+            sub_image = (sub_image - sub_image.min()) / (
+                sub_image.max() - sub_image.min()
+            )
+
+            centroids = subpixel_point_estimation.moment_method_torch(
+                sub_image.unsqueeze(0)
+            ).squeeze()
+
+            refined_x = (
+                x_windows[points_index, frame_index, 0, 0] + centroids[0] + x0 - 1
+            ).item()
+            refined_y = (
+                y_windows[points_index, frame_index, 0, 0] + centroids[1] + y0 - 1
+            ).item()
+
+            on_crop_x = (x0 + centroids[0] - 1).item()
+            on_crop_y = (y0 + centroids[1] - 1).item()
+
+            optimized_points[points_index, frame_index] = torch.tensor(
+                [refined_x, refined_y]
+            )
+            optimized_points_on_crops[points_index, frame_index] = torch.tensor(
+                [on_crop_x, on_crop_y]
+            )
+
+        # Interpolate inbetween two points
+        for frame_index, label in enumerate(compute_string):
+            if label != "I":
+                continue
+
+            prev_v_index = compute_string.rfind("V", 0, frame_index)
+            next_v_index = compute_string.find("V", frame_index + 1)
+
+            lerp_alpha = (frame_index - prev_v_index) / (next_v_index - prev_v_index)
+            point_a = optimized_points[points_index, prev_v_index]
+            point_b = optimized_points[points_index, next_v_index]
+            lerped_point = VFLabel.utils.transforms.lerp(point_a, point_b, lerp_alpha)
+
+            optimized_points[points_index, frame_index] = lerped_point
+
+    return optimized_points, optimized_points_on_crops
+
+
+# Per point and per frame implementation that was used before gap interpolation got vectorized.
+def loop_interpolate_nans_2d(points: torch.tensor) -> torch.tensor:
+    # Points should be in FRAMELENGTH x HEIGHT x WIDTH x 2
+    FRAMES, HEIGHT, WIDTH, DIMENSIONS = points.shape
+    for y in range(HEIGHT):
+        for x in range(WIDTH):
+            point_over_time = points[:, y, x, :]
+            nan_mask = torch.isnan(point_over_time[:, 0]) * 1
+            compute_string = "".join(map(str, nan_mask.squeeze().tolist()))
+            # Replace 0s with V for visible
+            if nan_mask.sum() == FRAMES:
+                continue
+
+            for frame_index, label in enumerate(compute_string):
+                if label == "0":
+                    continue
+
+                prev_v_index = compute_string.rfind("0", 0, frame_index)
+                next_v_index = compute_string.find("0", frame_index + 1)
+
+                lerp_alpha = (frame_index - prev_v_index) / (
+                    next_v_index - prev_v_index
+                )
+                point_a = point_over_time[prev_v_index]
+                point_b = point_over_time[next_v_index]
+                lerped_point = VFLabel.utils.transforms.lerp(
+                    point_a, point_b, lerp_alpha
+                )
+
+                points[frame_index, y, x] = lerped_point
+
+    return points
+
+
+# Per point implementations that were used before border padding got vectorized.
+def loop_fill_nan_border_values(points: torch.tensor) -> torch.tensor:
+    for point_index, point_over_time in enumerate(points):
+        nan_count_start = 0
+        nan_count_end = 0
+
+        nan_mask = torch.isnan(point_over_time[:, 0])
+
+        for val in nan_mask:
+            # Count nans at beginning of sequence
+            if val:
+                nan_count_start += 1
+            else:
+                break
+
+        for val in nan_mask.flip(0):
+            # Count nans at end of sequence
+            if val:
+                nan_count_end += 1
+            else:
+                break
+
+        if (
+            nan_count_start == nan_count_end
+            and nan_count_start == point_over_time.shape[0]
+        ):
+            continue
+
+        if nan_count_end != 0:
+            point_over_time = point_over_time[nan_count_start:-nan_count_end]
+        else:
+            point_over_time = point_over_time[nan_count_start:]
+
+        point_over_time = torch.nn.functional.pad(
+            point_over_time.permute(1, 0), (nan_count_start, nan_count_end), "replicate"
+        ).permute(1, 0)
+        points[point_index] = point_over_time
+
+    return points
+
+
+def loop_fill_nan_border_values_2d(points: torch.tensor) -> torch.tensor:
+    # Points should be in FRAMELENGTH x HEIGHT x WIDTH x 2
+    FRAMES, HEIGHT, WIDTH, DIMENSIONS = points.shape
+    for y in range(HEIGHT):
+        for x in range(WIDTH):
+            nan_count_start = 0
+            nan_count_end = 0
+
+            point_over_time = points[:, y, x, :]
+            nan_mask = torch.isnan(point_over_time[:, 0])
+
+            for val in nan_mask:
+                # Count nans at beginning of sequence
+                if val:
+                    nan_count_start += 1
+                else:
+                    break
+
+            for val in nan_mask.flip(0):
+                # Count nans at end of sequence
+                if val:
+                    nan_count_end += 1
+                else:
+                    break
+
+            if nan_count_start == nan_count_end and nan_count_start == FRAMES:
+                continue
+
+            if nan_count_end != 0:
+                point_over_time = point_over_time[nan_count_start:-nan_count_end]
+            else:
+                point_over_time = point_over_time[nan_count_start:]
+
+            point_over_time = torch.nn.functional.pad(
+                point_over_time.permute(1, 0),
+                (nan_count_start, nan_count_end),
+                "replicate",
+            ).permute(1, 0)
+            points[:, y, x, :] = point_over_time
+
+    return points
+
+
+# Per point implementation that was used before smoothing got batched.
+def loop_smooth_points(points: torch.tensor) -> torch.tensor:
+    # We know that only values are nan, that lie at the border of the frames.
+    # So we can easily convolve with a gaussian kernel
+
+    # Define a Gaussian kernel
+    def gaussian_kernel(size, sigma):
+        x = torch.arange(-size // 2 + 1, size // 2 + 1)
+        kernel = torch.exp(-0.5 * (x / sigma) ** 2)
+        kernel /= kernel.sum()  # Normalize
+        return kernel
+
+    kernel_size = 5
+    sigma = 1.0
+    kernel = gaussian_kernel(kernel_size, sigma).view(1, 1, -1)
+
+    for point_over_time in points:
+        is_not_nan = ~torch.isnan(point_over_time[:, 0])
+        non_nan_points = point_over_time[is_not_nan]
+
+        if len(non_nan_points) < 10:
+            continue
+
+        a = non_nan_points.permute(1, 0).unsqueeze(1)
+        padded_points = torch.nn.functional.pad(
+            a, (kernel_size // 2, kernel_size // 2), "replicate"
+        )
+        smoothed_points = F.conv1d(padded_points, kernel.double(), padding=0)
+        smoothed_points = smoothed_points.squeeze(1).permute(1, 0)
+        point_over_time[is_not_nan] = smoothed_points
+
+    return points
+
+
+# Per frame implementation that was used before both filters got combined.
+# Note that it drops real points at coordinate 0, since 0 is used as a NaN sentinel.
+def loop_filter_points(
+    point_predictions: np.array, segmentations: np.array, on_segmentation: bool
+) -> np.array:
+    filtered_points = np.nan_to_num(point_predictions, 0)
+    point_indices = np.floor(filtered_points).astype(int)
+
+    for frame_index, (points_in_frame, segmentation) in enumerate(
+        zip(point_indices, segmentations)
+    ):
+        hits = segmentation[points_in_frame[:, 1], points_in_frame[:, 0]]
+        hits = ((hits > 0) if on_segmentation else (hits == 0)) * 1
+        filtered_points[frame_index] *= hits[:, None]
+
+    filtered_points[filtered_points == 0] = np.nan
+
+    return filtered_points
@@ -0,0 +1,52 @@
+import argparse
+import glob
+import os
+
+import torch
+
+import VFLabel.nn.batch_tracking
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "Batch Point Tracking",
+        "Track the clicked laserpoints of many projects without the GUI.",
+    )
+
+    parser.add_argument(
+        "projects",
+        type=str,
+        nargs="+",
+        help="Project folders, or folders containing projects when --recursive is set.",
+    )
+    parser.add_argument("--recursive", action="store_true")
+    parser.add_argument(
+        "--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu"
+    )
+    parser.add_argument("--window_size", type=int, default=50)
+    parser.add_argument("--stride", type=int, default=25)
+
+    args = parser.parse_args()
+
+    project_paths = args.projects
+    if args.recursive:
+        project_paths = sorted(
+            os.path.dirname(path)
+            for folder in args.projects
+            for path in glob.glob(
+                os.path.join(folder, "**", "clicked_laserpoints.json"), recursive=True
+            )
+        )
+
+    errors = VFLabel.nn.batch_tracking.track_projects(
+        project_paths,
+        device=args.device,
+        window_size=args.window_size,
+        stride=args.stride,
+    )
+
+    for project_path, error in errors.items():
+        print(f"Tracking {project_path} failed: {error}")
+
+    print(
+        f"Tracked {len(project_paths) - len(errors)} of {len(project_paths)} projects."
+    )